@@ -0,0 +1,238 @@
+"""
+Simulates a problem in another process while the visualiser draws it, so
+that how fast the simulation runs is bound by the simulation itself rather
+than by the frame rate and the cost of drawing, and dragging nodes around
+never holds it up.
+
+    worker = SimulationWorker(problem)
+    worker.start()
+    worker.roll(True)
+    ...
+    state = worker.latest()
+    if state is not None:
+        restore(problem, state)
+    ...
+    restore(problem, worker.stop())
+
+The problem is sent to the worker as a snapshot (see snapshot.py), so it
+must be one that can be saved, and the worker simulates its own copy of it.
+While it steps, the worker sends the state of the places that changed (see
+`snapshot.capture_state`) about every frame, which the visualiser restores
+into its problem before drawing it. A state is only sent once the last one
+was taken, the changes in between are gathered into the next one.
+"""
+from multiprocessing import get_context
+from queue import Empty, Full
+from time import perf_counter as now
+import traceback
+
+from snapshot import dumps, loads, capture_state, restore_state, save_checkpoint
+
+# seconds between states sent by the worker
+INTERVAL = 1 / 30
+# seconds in which a rolling simulation takes `speed` steps
+ROLL_PERIOD = 0.1
+
+def _place_name(place):
+    name = place.get_id()
+    if name.endswith(".queue"):
+        name = name[:-len(".queue")]
+    return name
+
+def _capture(problem, changed, owners, steps, took):
+    """
+    Returns the state of the places that changed, or of all places if
+    changed is None, with the statistics of the end events that fired and
+    the number of steps taken since the last state and the time they took.
+    """
+    state = capture_state(problem, changed)
+    if changed is None:
+        prototypes = set(owners.values())
+    else:
+        prototypes = set(owners[name] for name in changed if name in owners)
+    state["changed"] = None if changed is None else list(changed)
+    state["stats"] = {
+        prototype.get_id() : prototype.stats for prototype in prototypes
+    }
+    state["steps"] = steps
+    state["took"] = took
+    return state
+
+def _simulate(snapshot, commands, states, interval=INTERVAL):
+    """
+    Runs in the worker, taking the steps asked for by the commands and
+    sending the states of the problem back.
+    """
+    try:
+        problem = loads(snapshot)
+        # the end events, which keep statistics rather than tokens
+        owners = {
+            event.get_id() : prototype
+            for prototype in problem.prototypes if hasattr(prototype, "stats")
+            for event in prototype.events
+        }
+        speed, rolling, pending = 1, False, 0
+        done, period_end = 0, now()
+        # the places and events changed since the last state, None for all
+        changed = None
+        steps, took = 0, 0.0
+        while True:
+            if pending > 0 or (rolling and done < speed):
+                timeout = 0
+            elif rolling:
+                timeout = max(0.0, period_end - now())
+            elif changed is None or changed:
+                timeout = interval
+            else:
+                timeout = None
+            try:
+                command, value = commands.get(timeout=timeout)
+            except Empty:
+                command = None
+            if command == "stop":
+                if value is not None:
+                    save_checkpoint(value, problem)
+                states.put(("final", _capture(problem, None, owners, steps, took)))
+                return
+            elif command == "checkpoint":
+                save_checkpoint(value, problem)
+            elif command == "step":
+                pending += value
+            elif command == "roll":
+                rolling = value
+                done, period_end = 0, now() + ROLL_PERIOD
+            elif command == "speed":
+                speed = value
+            if rolling and now() >= period_end:
+                done, period_end = 0, now() + ROLL_PERIOD
+
+            start = now()
+            until = start + interval
+            while (pending > 0 or (rolling and done < speed)) and now() < until:
+                timed_binding = problem.step()
+                if timed_binding is None:
+                    pending, rolling = 0, False
+                    break
+                steps += 1
+                if pending > 0:
+                    pending -= 1
+                else:
+                    done += 1
+                if changed is not None:
+                    binding, _, event = timed_binding
+                    changed.add(event.get_id())
+                    changed.update(_place_name(place) for place, _ in binding)
+                    changed.update(_place_name(place) for place in event.outgoing)
+            took += now() - start
+
+            if changed is None or changed:
+                try:
+                    states.put_nowait(
+                        ("state", _capture(problem, changed, owners, steps, took))
+                    )
+                    changed, steps, took = set(), 0, 0.0
+                except Full:
+                    pass
+    except Exception:
+        states.put(("error", traceback.format_exc()))
+
+def restore(problem, state):
+    """
+    Restores a state sent by the worker into the problem, see
+    `snapshot.restore_state`, together with the statistics of its end events.
+    """
+    restore_state(problem, state)
+    stats = state["stats"]
+    for prototype in problem.prototypes:
+        if prototype.get_id() in stats:
+            prototype.stats = stats[prototype.get_id()]
+
+class SimulationWorker:
+    """
+    Simulates a copy of the problem in another process, see the module.
+
+    :param interval: the seconds between states sent by the worker.
+    """
+
+    def __init__(self, problem, interval=INTERVAL):
+        self.problem = problem
+        self.interval = interval
+        # spawned rather than forked, as the visualiser has a window open
+        self._context = get_context("spawn")
+        self._commands = self._context.Queue()
+        self._states = self._context.Queue(maxsize=1)
+        self._process = None
+
+    def start(self):
+        """
+        Starts the worker with a snapshot of the problem as it is now.
+        """
+        self._process = self._context.Process(
+            target=_simulate,
+            args=(dumps(self.problem), self._commands, self._states,
+                  self.interval),
+            daemon=True
+        )
+        self._process.start()
+
+    def step(self, count=1):
+        """
+        Asks the worker to take the given number of steps.
+        """
+        self._commands.put(("step", count))
+
+    def roll(self, rolling=True):
+        """
+        Starts or stops the worker taking steps on its own, `speed` steps
+        every tenth of a second.
+        """
+        self._commands.put(("roll", rolling))
+
+    def set_speed(self, speed):
+        self._commands.put(("speed", speed))
+
+    def checkpoint(self, filename):
+        """
+        Asks the worker to write a checkpoint of its problem to the file,
+        see `snapshot.save_checkpoint`, in between two steps.
+        """
+        self._commands.put(("checkpoint", filename))
+
+    def latest(self):
+        """
+        Returns the state sent by the worker since the last call, or None if
+        there is none.
+        """
+        try:
+            kind, state = self._states.get_nowait()
+        except Empty:
+            return None
+        if kind == "error":
+            raise RuntimeError(f"the simulation failed in the worker:\n{state}")
+        return state
+
+    def stop(self, checkpoint=None, timeout=10.0):
+        """
+        Stops the worker, after it writes a checkpoint to the given file if
+        any. Returns the state of all places in the end, or None if the
+        worker did not send it in time.
+        """
+        if self._process is None or not self._process.is_alive():
+            return None
+        self._commands.put(("stop", checkpoint))
+        deadline = now() + timeout
+        final = None
+        while final is None and now() < deadline:
+            try:
+                kind, state = self._states.get(timeout=deadline - now())
+            except Empty:
+                break
+            if kind == "final":
+                final = state
+            elif kind == "error":
+                print(f"the simulation failed in the worker:\n{state}")
+                break
+        self._process.join(timeout=1.0)
+        if self._process.is_alive():
+            self._process.terminate()
+        return final
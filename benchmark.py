@@ -0,0 +1,230 @@
+"""
+Benchmarks the simulation of the tutorial models, each run headlessly at a
+fixed seed, number of agents and duration, so that changes to the engine
+can be measured against the same numbers every time.
+
+    python benchmark.py                      # runs all, compares to baseline
+    python benchmark.py tut-bpmn-01 -r 3     # best of three runs of one
+    python benchmark.py --save-baseline      # stores the results as baseline
+
+For each model, the number of steps and process events (see
+`eventlog.events_of`) per second, the peak memory of the process and the
+time spent in each phase of a step (see `metrics.TimingCollector`) are
+recorded. Each run happens in a fresh process, so that peak memory is its
+own. Results are written as JSON and compared to the stored baseline, with
+any model slower or larger by more than the tolerance flagged as a
+regression, and any model taking a different number of steps flagged as
+changed, as it no longer simulates the same run.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from os.path import exists
+from time import perf_counter as now
+import argparse
+import json
+import platform
+import sys
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+BASELINE = "benchmark-baseline.json"
+SEED = 42
+
+# the factory, agents and duration of each benchmark
+BENCHMARKS = {
+    "tut-bpmn-01" : ("tut-bpmn-01.py:build", 25, 10),
+    "tut-bpmn-01-1000" : ("tut-bpmn-01.py:build", 1000, 10),
+    "tut-bpmn-02" : ("tut-bpmn-02.py:build", 25, 20),
+    "tut-bpmn-03" : ("tut-bpmn-03.py:build", 25, 20),
+    "tut-bpmn-04" : ("tut-bpmn-04.py:build", 25, 20),
+    "tut-bpmn-05" : ("tut-bpmn-05.py:build", 25, 20),
+    "tut-bpmn-master" : ("tut-bpmn-master.py:build", 25, 10),
+}
+
+# the measures compared to the baseline, and whether higher is better
+MEASURES = {
+    "steps_per_sec" : True,
+    "events_per_sec" : True,
+    "peak_rss_kb" : False,
+}
+
+class EventCounter:
+    """
+    A reporter counting the process events in the bindings that fired.
+    """
+
+    def __init__(self):
+        self.events = 0
+
+    def callback(self, timed_binding):
+        from eventlog import events_of
+        for _ in events_of(timed_binding):
+            self.events += 1
+
+def peak_rss():
+    """
+    Returns the peak resident memory of this process in KB, or None where
+    it cannot be read.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes rather than KB
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+def bench(name):
+    """
+    Builds and simulates the benchmark with the given name, returning its
+    measurements.
+    """
+    from random import seed
+    from experiments import load_factory
+    from headless import run
+    from metrics import TimingCollector, PHASES
+
+    factory, agents, duration = BENCHMARKS[name]
+    seed(SEED)
+    start = now()
+    problem = load_factory(factory)(agents=agents)
+    built = now() - start
+    timings = TimingCollector(size=1)
+    problem.timings = timings
+    counter = EventCounter()
+    start = now()
+    steps = run(problem, duration, counter, progress_interval=None)
+    took = now() - start
+    return {
+        "agents" : agents,
+        "duration" : duration,
+        "steps" : steps,
+        "events" : counter.events,
+        "build_sec" : built,
+        "run_sec" : took,
+        "steps_per_sec" : steps / took if took > 0 else None,
+        "events_per_sec" : counter.events / took if took > 0 else None,
+        "peak_rss_kb" : peak_rss(),
+        "phases_sec" : { phase : timings.totals[phase] for phase in PHASES },
+    }
+
+def run_benchmarks(names, repeats=1):
+    """
+    Runs each benchmark `repeats` times, each in a fresh process, keeping
+    the fastest run of each.
+    """
+    results = dict()
+    with ProcessPoolExecutor(max_workers=1, max_tasks_per_child=1) as pool:
+        for name in names:
+            runs = [ pool.submit(bench, name) for _ in range(repeats) ]
+            runs = [ future.result() for future in runs ]
+            results[name] = min(runs, key=lambda result: result["run_sec"])
+            print_result(name, results[name])
+    return {
+        "created" : datetime.now().isoformat(timespec="seconds"),
+        "machine" : machine(),
+        "results" : results,
+    }
+
+def machine():
+    return {
+        "python" : platform.python_version(),
+        "platform" : platform.platform(),
+        "processor" : platform.processor() or platform.machine(),
+    }
+
+def print_result(name, result):
+    phases = " ".join(
+        f"{phase}={took:.2f}s" for phase, took in result["phases_sec"].items()
+    )
+    rss = result["peak_rss_kb"]
+    print(
+        f"{name:>18} :: {result['steps']} steps in {result['run_sec']:.2f}s, "
+        f"{result['steps_per_sec']:.0f} steps/s, "
+        f"{result['events_per_sec']:.0f} events/s, "
+        f"peak {'-' if rss is None else f'{rss/1024:.0f}MB'} ({phases})"
+    )
+
+def compare(current, baseline, tolerance=0.1):
+    """
+    Compares the results to those of the baseline, returning a list of the
+    regressions and a list of the changes found, as messages.
+    """
+    regressions = []
+    changes = []
+    if current["machine"] != baseline["machine"]:
+        changes.append(
+            f"baseline is from another machine ({baseline['machine']}), "
+            "differences may not be from the code"
+        )
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        if result["steps"] != base["steps"]:
+            changes.append(
+                f"{name} took {result['steps']} steps, "
+                f"not {base['steps']} as in the baseline"
+            )
+        for measure, higher in MEASURES.items():
+            value, was = result.get(measure), base.get(measure)
+            if value is None or not was:
+                continue
+            change = (value - was) / was
+            if (higher and change < -tolerance) \
+                or (not higher and change > tolerance):
+                regressions.append(
+                    f"{name} {measure} went from {was:.0f} to {value:.0f} "
+                    f"({change:+.0%})"
+                )
+    return regressions, changes
+
+def load(filename):
+    with open(filename, "r") as f:
+        return json.load(f)
+
+def save(results, filename):
+    with open(filename, "w") as f:
+        json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the simulation of the tutorial models."
+    )
+    parser.add_argument("names", nargs="*", default=list(BENCHMARKS),
+        help=f"the benchmarks to run, of {', '.join(BENCHMARKS)}")
+    parser.add_argument("-r", "--repeats", type=int, default=1)
+    parser.add_argument("-o", "--output", default="benchmark-results.json")
+    parser.add_argument("-b", "--baseline", default=BASELINE)
+    parser.add_argument("-t", "--tolerance", type=float, default=0.1,
+        help="the fraction a measure may get worse before it is flagged")
+    parser.add_argument("--save-baseline", action="store_true",
+        help="store the results as the baseline instead of comparing")
+    args = parser.parse_args()
+
+    for name in args.names:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark {name}")
+    results = run_benchmarks(args.names, args.repeats)
+    save(results, args.output)
+    if args.save_baseline:
+        if exists(args.baseline):
+            # keep the baselines of benchmarks that were not run
+            kept = load(args.baseline)["results"]
+            results["results"] = { **kept, **results["results"] }
+        save(results, args.baseline)
+        print(f"saved the baseline to {args.baseline}")
+    elif exists(args.baseline):
+        regressions, changes = compare(
+            results, load(args.baseline), args.tolerance
+        )
+        for message in changes:
+            print(f"CHANGED :: {message}")
+        for message in regressions:
+            print(f"REGRESSION :: {message}")
+        if regressions:
+            sys.exit(1)
+        print("no regressions against the baseline")
+    else:
+        print(f"no baseline at {args.baseline}, store one with --save-baseline")
@@ -7,6 +7,8 @@ import math
 
 from abc import abstractmethod
 from typing import Literal, List, Union
+from util import Case
+from metrics import CompletionStats, case_of
 
 class CustomBPMNTask(BPMNTask):
     """
@@ -38,19 +40,17 @@ class CustomBPMNTask(BPMNTask):
             x_pos, y_pos = int(self._pos[0] - self._width/2), int(self._pos[1] - self._height/2)
             pygame.draw.rect(screen, vis.TUE_LIGHTBLUE, pygame.Rect(x_pos, y_pos, self._width, self._height), border_radius=int(0.075*self._width))
             pygame.draw.rect(screen, vis.TUE_BLUE, pygame.Rect(x_pos, y_pos, self._width, self._height),  vis.LINE_WIDTH, int(0.075*self._width))
-            font = pygame.font.SysFont('Calibri', vis.TEXT_SIZE)
-            bold_font = pygame.font.SysFont('Calibri', vis.TEXT_SIZE, bold=True)
 
             # draw label
-            label = font.render(self._model_node.get_id(), True, vis.TUE_BLUE)
+            label = vis.render_text(self._model_node.get_id(), vis.TUE_BLUE)
             text_x_pos = int((self._width - label.get_width())/2) + x_pos
             text_y_pos = int((self._height - label.get_height())/2) + y_pos
             screen.blit(label, (text_x_pos, text_y_pos))
 
             # draw marking
-            self.__marking(screen, font)
+            self.__marking(screen)
 
-        def __marking(self, screen, font):
+        def __marking(self, screen):
             early = None
             last = self._late
             work = len(self._model_node._busyvar.marking)
@@ -68,7 +68,7 @@ class CustomBPMNTask(BPMNTask):
             
             mstr = f"x{work} E: {early if early is not None else 'X'} L: {last}"
 
-            label = font.render(mstr, True, vis.TUE_RED)
+            label = vis.render_changing(self, "_marking_label", mstr, vis.TUE_RED)
             text_x_pos = self._pos[0] - int(label.get_width()/2)
             text_y_pos = self._pos[1] + self._half_height + vis.LINE_WIDTH
             screen.blit(label, (text_x_pos, text_y_pos))     
@@ -159,11 +159,18 @@ class HelperBPMNStart(Prototype):
     Subclass this and implement the interarrival_time as a static/class method (no self argument).
     Set model, outgoing, and name as static class variables in your subclass.
     Just defining the class is enough; no instantiation needed.
+
+    Optionally set `amount` for the number of cases arriving per batch, 
+    `window` for the number of batches scheduled ahead in one firing and
+    `limit` for the total number of cases to generate. Arrivals also stop 
+    once interarrival_time returns None, see `util.scheduled_interarrival`.
     """
     model = None
     outgoing = None
     name = None
     amount = None
+    window = None
+    limit = None
 
     def __init__(self, 
                  model:SimProblem, 
@@ -172,10 +179,14 @@ class HelperBPMNStart(Prototype):
                  name, 
                  interarrival_time, 
                  behavior=None,
-                 amount=1
+                 amount=1,
+                 window=1,
+                 limit=None
                  ):
         super().__init__(model, incoming, outgoing, name)
         self.amount = amount
+        self.window = window
+        self.limit = limit
 
         if len(incoming) != 0:
             raise TypeError("Start event " + name + ": cannot have any incoming.")
@@ -194,7 +205,7 @@ class HelperBPMNStart(Prototype):
             gen = lambda tok: self.generate(tok, interarrival_time_f)
             result = model.add_event(
                 [invar], 
-                [invar] + [outgoing[0]] * amount, 
+                [invar] + [outgoing[0]] * (amount * window), 
                 gen,
                 name=name + "<start_event>")
             self.add_event(result)
@@ -205,40 +216,51 @@ class HelperBPMNStart(Prototype):
                 raise TypeError("Start event " + name + ": the behavior function must not have many parameters.")
             result = model.add_event(
                 [invar], 
-                [invar] +  [outgoing[0]] * amount, 
+                [invar] +  [outgoing[0]] * (amount * window), 
                 gen, 
                 name=name + "<start_event>"
             )
             self.add_event(result)
-        invar.put(name + "0")
+        # the timer carries the id of the next case to arrive
+        invar.put(0)
 
         model.add_prototype(self)
 
     def generate(self, a, delay) -> List:
         """
-        Can I make it so that we have multiple outputs?
+        Generates `window` batches of `amount` cases in one firing, numbered
+        on from the counter `a` on the timer token, with each batch delayed
+        by the interarrival times before it. Returns the timer for the batch
+        after, or None for it once arrivals stop.
         """
-        if self.amount is not None and isinstance(self.amount, int):
-            ret = []
-            start_id = int(a[len(self.name):])
-            ret.append(
-                SimToken(
-                    f"{self.name}-{start_id+self.amount+1}", 
-                    delay=delay()
-                )
-            )
-            for tok in range(self.amount):
-                ret.append(
-                    SimToken((f"{self.name}-{start_id+tok}",))
+        cases = []
+        case_id = a
+        offset = 0
+        stopped = False
+        for _ in range(self.window):
+            for _ in range(self.amount):
+                if self.limit is not None and case_id >= self.limit:
+                    stopped = True
+                    break
+                cases.append(
+                    SimToken(
+                        Case(case_id, 0, self.name, self.model.clock + offset),
+                        delay=offset
+                    )
                 )
-            return ret
-        else:
-            return [
-                SimToken(self.name + str(int(a[len(self.name):]) + 1), 
-                        delay=delay()
-                ),
-                SimToken((a,))
-            ]
+                case_id += 1
+            if self.limit is not None and case_id >= self.limit:
+                # no batch follows, so no gap is drawn for it
+                stopped = True
+            gap = None if stopped else delay()
+            if gap is None:
+                stopped = True
+                break
+            offset += gap
+        timer = None if stopped else SimToken(case_id, delay=offset)
+        # outgoing arcs without a case get None
+        cases.extend([None] * (self.amount * self.window - len(cases)))
+        return [timer] + cases
 
     @staticmethod
     def __create__(cls, **kwargs):
@@ -246,6 +268,8 @@ class HelperBPMNStart(Prototype):
         outgoing = getattr(cls, 'outgoing', None)
         name = getattr(cls, 'name', None)
         amount = getattr(cls, 'amount', 1)
+        window = getattr(cls, 'window', None) or 1
+        limit = getattr(cls, 'limit', None)
         if model is None or outgoing is None or name is None:
             if cls.__name__ == 'HelperBPMNStart':
                 return
@@ -254,13 +278,16 @@ class HelperBPMNStart(Prototype):
         if interarrival_time is None or not callable(interarrival_time):
             raise NotImplementedError("You must implement a static/class method 'interarrival_time()' in your HelperBPMNStart subclass.")
         # Register the start event with the model by instantiating BPMNStartEvent
-        HelperBPMNStart(model, [], outgoing, name, interarrival_time, amount=amount)
+        HelperBPMNStart(model, [], outgoing, name, interarrival_time, 
+                        amount=amount, window=window, limit=limit)
 
     def __init_subclass__(cls, **kwargs):
         model = getattr(cls, 'model', None)
         outgoing = getattr(cls, 'outgoing', None)
         name = getattr(cls, 'name', None)
         amount = getattr(cls, 'amount', 1)
+        window = getattr(cls, 'window', None) or 1
+        limit = getattr(cls, 'limit', None)
         if model is None or outgoing is None or name is None:
             if cls.__name__ == 'HelperBPMNStart':
                 return
@@ -269,7 +296,8 @@ class HelperBPMNStart(Prototype):
         if interarrival_time is None or not callable(interarrival_time):
             raise NotImplementedError("You must implement a static/class method 'interarrival_time()' in your HelperBPMNStart subclass.")
         # Register the start event with the model by instantiating BPMNStartEvent
-        cls(model, [], outgoing, name, interarrival_time, amount=amount)
+        cls(model, [], outgoing, name, interarrival_time, 
+            amount=amount, window=window, limit=limit)
 
     @staticmethod
     @abstractmethod
@@ -290,10 +318,32 @@ class HelperBPMNEnd(BPMNEndEvent):
     Set model, outgoing, and name as static class variables in your 
     subclass.
     Just defining the class is enough; no instantiation needed.
+
+    The cases reaching the end event are counted in `stats`, see 
+    `metrics.CompletionStats`, which takes the same memory however many
+    complete. Set `capture = True` to also keep every completed case token
+    in `_captures`.
     """
     model = None
     incoming = None
     name = None
+    capture = False
+
+    def __init__(self, model, incoming, outgoing, name, capture=False):
+        super().__init__(model, incoming, outgoing, name)
+        self.stats = CompletionStats()
+        self._captures = [] if capture else None
+        self.events[0].set_behavior(self.complete)
+
+    def complete(self, c):
+        """
+        The behaviour of the end event, which records the case completing.
+        """
+        time = self.model.clock
+        self.stats.record(case_of(c), time)
+        if self._captures is not None:
+            self._captures.append(SimToken(c, time))
+        return []
 
     @staticmethod
     def __create__(cls, **kwargs):
@@ -305,7 +355,8 @@ class HelperBPMNEnd(BPMNEndEvent):
                 return
             raise ValueError("You must define static class variables: model, outgoing, and name in your HelperBPMNStart subclass.")
         # Register the start event with the model by instantiating BPMNStartEvent
-        HelperBPMNEnd(model, incoming, [], name)
+        HelperBPMNEnd(model, incoming, [], name, 
+                      capture=getattr(cls, 'capture', False))
 
     def __init_subclass__(cls, **kwargs):
         super().__init_subclass__(**kwargs)
@@ -317,86 +368,57 @@ class HelperBPMNEnd(BPMNEndEvent):
                 return
             raise ValueError("You must define static class variables: model, outgoing, and name in your HelperBPMNStart subclass.")
         # Register the start event with the model by instantiating BPMNStartEvent
-        cls(model, incoming, [], name)
+        cls(model, incoming, [], name, capture=cls.capture)
 
     class BPMNEndEventViz(vis.Node):
         def __init__(self, model_node):
             super().__init__(model_node)
-            self._last_time = None
         
         def draw(self, screen):
             pygame.draw.circle(screen, vis.TUE_LIGHTBLUE, (self._pos[0], self._pos[1]), self._width/2)
             pygame.draw.circle(screen, vis.TUE_BLUE, (self._pos[0], self._pos[1]), self._width/2, vis.LINE_WIDTH*2)
-            font = pygame.font.SysFont('Calibri', vis.TEXT_SIZE)
-            bold_font = pygame.font.SysFont('Calibri', vis.TEXT_SIZE, bold=True)
 
             # draw label
-            label = font.render(self._model_node.get_id(), True, vis.TUE_BLUE)
+            label = vis.render_text(self._model_node.get_id(), vis.TUE_BLUE)
             text_x_pos = self._pos[0] - int(label.get_width()/2)
             text_y_pos = self._pos[1] + self._half_height + vis.LINE_WIDTH
             screen.blit(label, (text_x_pos, text_y_pos))
 
             # draw marking
-            markings = [ token for token in self._model_node._captures ]
-            last_time = self._last_time
+            stats = self._model_node.stats
+            count = stats.completed
+            last_time = None
+            if stats.last_completion is not None:
+                last_time = round(stats.last_completion, 2)
             radius = self._half_height * 0.5  # distance from center for small circles
             small_radius = self._half_height * 0.18
             n = 8
-            if (len(markings) < n):
-                for i,token in enumerate(markings):
-                    angle = 2 * math.pi * i / n  # angle in radians
-                    x_offset = radius * math.cos(angle)
-                    y_offset = radius * math.sin(angle)
-                    pygame.draw.circle(
-                        screen, vis.TUE_GREY,
-                        (int(self._pos[0] + x_offset), int(self._pos[1] + y_offset)),
-                        int(small_radius)
-                    )
-                    pygame.draw.circle(
-                        screen, pygame.colordict.THECOLORS.get('black'),
-                        (int(self._pos[0] + x_offset), int(self._pos[1] + y_offset)),
-                        int(small_radius),
-                        vis.LINE_WIDTH
-                    )
-                    if last_time is None:
-                        last_time = round(token.time, 2)
-                    elif last_time < token.time:
-                        last_time = round(token.time, 2)
+            for i in range(min(count, n)):
+                angle = 2 * math.pi * i / n  # angle in radians
+                x_offset = radius * math.cos(angle)
+                y_offset = radius * math.sin(angle)
+                pygame.draw.circle(
+                    screen, vis.TUE_GREY,
+                    (int(self._pos[0] + x_offset), int(self._pos[1] + y_offset)),
+                    int(small_radius)
+                )
+                pygame.draw.circle(
+                    screen, pygame.colordict.THECOLORS.get('black'),
+                    (int(self._pos[0] + x_offset), int(self._pos[1] + y_offset)),
+                    int(small_radius),
+                    vis.LINE_WIDTH
+                )
+            if (count < n):
                 mstr = f"last @ {last_time}"
             else:
-
-                count = len(markings)
-                for i,token in enumerate(markings):
-                    if (i < n):
-                        angle = 2 * math.pi * i / n  # angle in radians
-                        x_offset = radius * math.cos(angle)
-                        y_offset = radius * math.sin(angle)
-                        pygame.draw.circle(
-                            screen, vis.TUE_GREY,
-                            (int(self._pos[0] + x_offset), int(self._pos[1] + y_offset)),
-                            int(small_radius)
-                        )
-                        pygame.draw.circle(
-                            screen, pygame.colordict.THECOLORS.get('black'),
-                            (int(self._pos[0] + x_offset), int(self._pos[1] + y_offset)),
-                            int(small_radius),
-                            vis.LINE_WIDTH
-                        )
-                    if last_time is None:
-                        last_time = round(token.time, 2)
-                    elif last_time < token.time:
-                        last_time = round(token.time, 2)
-
-                label = bold_font.render(f"{n}+", True, vis.TUE_RED)
+                label = vis.render_text(f"{n}+", vis.TUE_RED, bold=True)
                 screen.blit(label, (self._pos[0]-self._half_height * 0.25, self._pos[1]-self._half_height * 0.25))
                 mstr = f"(x{count}) last @ {last_time}"
                 
-            label = bold_font.render(mstr, True, vis.TUE_RED)
+            label = vis.render_changing(self, "_marking_label", mstr, vis.TUE_RED, bold=True)
             text_x_pos = self._pos[0] - int(label.get_width()/2)
             text_y_pos = self._pos[1] + self._half_height + vis.LINE_WIDTH + int(label.get_height())
             screen.blit(label, (text_x_pos, text_y_pos))      
-            if (last_time != None): 
-                self._last_time = last_time 
 
     def get_visualisation(self):
         return self.BPMNEndEventViz(self)
@@ -463,10 +485,9 @@ class HelperBPMNIntermediateEvent(BPMNIntermediateEvent):
             pygame.draw.circle(screen, vis.TUE_LIGHTBLUE, (self._pos[0], self._pos[1]), self._width/2)
             pygame.draw.circle(screen, vis.TUE_BLUE, (self._pos[0], self._pos[1]), self._width/2, vis.LINE_WIDTH)   
             pygame.draw.circle(screen, vis.TUE_BLUE, (self._pos[0], self._pos[1]), self._width/2-3, vis.LINE_WIDTH)   
-            font = pygame.font.SysFont('Calibri', vis.TEXT_SIZE)
 
             # draw label
-            label = font.render(self._model_node.get_id(), True, vis.TUE_BLUE)
+            label = vis.render_text(self._model_node.get_id(), vis.TUE_BLUE)
             text_x_pos = self._pos[0] - int(label.get_width()/2)
             text_y_pos = self._pos[1] + self._half_height + vis.LINE_WIDTH
             screen.blit(label, (text_x_pos, text_y_pos))
@@ -492,7 +513,7 @@ class HelperBPMNIntermediateEvent(BPMNIntermediateEvent):
             
             mstr = f"x{work} E: {early if early is not None else 'X'} L: {last}"
 
-            label = font.render(mstr, True, vis.TUE_RED)
+            label = vis.render_changing(self, "_marking_label", mstr, vis.TUE_RED)
             text_x_pos = self._pos[0] - int(label.get_width()/2)
             text_y_pos = self._pos[1] + self._half_height + vis.LINE_WIDTH
             screen.blit(label, (text_x_pos, text_y_pos))     
@@ -590,6 +611,16 @@ class HelperBPMNExclusiveJoin(BPMNExclusiveJoinGateway):
             cls.name
         )
 
+class ResourcePool(SimVar):
+    """
+    A place for a pool of interchangeable resources, e.g. agents.
+
+    As any resource in the pool will do, events without a guard only bind
+    the first available resource of the pool rather than every resource in
+    it, which avoids multiplying each case queue by the size of the pool.
+    """
+    _resource_pool = True
+
 class HelperResourcePool:
     """
     A helper subclass instance to make a resource pool
@@ -606,18 +637,18 @@ class HelperResourcePool:
     def __create__(cls, **kwargs):
         if any(hasattr(cls, attr) and getattr(cls, attr) is None for attr in ["name","model","amount"]):
             raise ValueError('Missing values for the following key attributes: ["name","model","amount"]')
-        place = cls.model.add_place(cls.name)
+        place = ResourcePool(cls.name)
+        cls.model.add_prototype_var(place)
         for i in range(cls.amount):
             place.put(f"{cls.name}-{i+1}") 
-        place._resource_pool = True
 
     def __init_subclass__(cls, **kwargs):
         if all(hasattr(cls, name) and getattr(cls, name) is not None for name in ["name","model","amount"]):
             raise ValueError('Missing values for the following key attributes: ["name","model","amount"]')
-        place = cls.model.add_place(cls.name)
+        place = ResourcePool(cls.name)
+        cls.model.add_prototype_var(place)
         for i in range(cls.amount):
             place.put(f"{cls.name}-{i+1}")
-        place._resource_pool = True
 
 
 TYPES = {
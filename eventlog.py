@@ -0,0 +1,446 @@
+"""
+Writes the event log of a simulation as it runs, for process mining tools.
+
+    from eventlog import open_log
+    log = open_log("sim.xes.gz")
+    problem.simulate(DURATION, log)
+    log.close()
+
+The writers are reporters, which turn the bindings that fired into events:
+the arrival of each case at a start event, the start and completion of each
+task (with the resource that performed it), and each intermediate and end
+event passed. Events are buffered and written in chunks of `chunk_size`, and
+compressed on the fly with gzip when the filename ends with ".gz", so that
+logs of millions of cases are never held in memory. For analysis of large
+logs, a columnar Parquet file can be written instead (see 
+`ParquetLogWriter`).
+
+The writers can be pickled along with the problem in a checkpoint (see
+`snapshot.save_checkpoint`); when loaded, the log is cut back to what was
+written at the time of the checkpoint and continues from there.
+"""
+from datetime import datetime, timedelta
+from os.path import getsize
+from xml.sax.saxutils import quoteattr
+import gzip
+
+from metrics import case_of
+from util import Case
+
+START = "start"
+COMPLETE = "complete"
+
+def _resource_of(binding):
+    """
+    Returns the resource in a binding, which is either a token taken from a
+    resource pool or the resource held with a case, e.g. by a busy task.
+    """
+    for place, token in binding:
+        if getattr(place, "_resource_pool", False):
+            return token.value
+    value = binding[0][1].value
+    if isinstance(value, tuple) and len(value) == 2 \
+        and case_of(value[0]) is not None:
+        return value[1]
+    return None
+
+def events_of(timed_binding):
+    """
+    Yields the events in a binding that fired, as tuples of the case id,
+    the activity, its lifecycle transition, the resource (or None) and the
+    time. Bindings of gateways give no events.
+
+    The case id is the start event of the case and its number there, e.g.
+    "arrive-12", as cases are only numbered per start event.
+    """
+    binding, time, event = timed_binding
+    ev_id = event.get_id()
+    activity, _, kind = ev_id.partition("<")
+    if kind == "start_event>":
+        # the cases of the firing are the latest on the outgoing place,
+        # numbered on from the counter on the timer
+        first = binding[0][1].value
+        cases = []
+        for token in reversed(event.outgoing[1].marking):
+            if token.time < time:
+                break
+            case = token.value
+            if isinstance(case, Case) and case.origin == activity \
+                and case.id >= first:
+                cases.append(case)
+        for case in sorted(cases):
+            yield (str(case), activity, COMPLETE, None, case.arrival)
+    elif kind in ("task:start>", "task:complete>"):
+        case = case_of(binding[0][1].value)
+        if case is not None:
+            yield (
+                str(case), activity,
+                START if kind == "task:start>" else COMPLETE,
+                _resource_of(binding), time
+            )
+    elif kind in ("intermediate_event>", "end_event>"):
+        case = case_of(binding[0][1].value)
+        if case is not None:
+            yield (str(case), activity, COMPLETE, _resource_of(binding), time)
+
+class EventLogWriter:
+    """
+    The base of the streaming log writers, which buffers the text of events
+    and writes it out in chunks.
+
+    :param filename: the file to write, compressed with gzip if it ends
+    with ".gz" (or if `compress` is True).
+    :param chunk_size: the number of events to buffer before writing them.
+    :param initial_time: the calendar time at simulation time 0, or None to
+    write simulation times as they are.
+    :param timeunit: the calendar time of one unit of simulation time.
+    """
+
+    def __init__(self, filename, chunk_size=10000,
+                 initial_time=datetime(2020, 1, 1),
+                 timeunit=timedelta(minutes=1), compress=None):
+        self.filename = filename
+        self.chunk_size = chunk_size
+        self.initial_time = initial_time
+        self.timeunit = timeunit
+        self.compress = filename.endswith(".gz") if compress is None \
+            else compress
+        self.events = 0
+        self._closed = False
+        self._buffer = []
+        self._file = self._open("wt")
+        self._buffer.append(self.header())
+
+    def _open(self, mode):
+        if self.compress:
+            return gzip.open(self.filename, mode, compresslevel=6)
+        return open(self.filename, mode, newline="")
+
+    def header(self):
+        return ""
+
+    def footer(self):
+        return ""
+
+    def format(self, case_id, activity, lifecycle, resource, time):
+        """
+        Returns the text written for a single event.
+        """
+        raise NotImplementedError()
+
+    def timestamp(self, time):
+        if self.initial_time is None:
+            return str(time)
+        return (self.initial_time + time * self.timeunit).isoformat(
+            sep=" ", timespec="microseconds"
+        )
+
+    def callback(self, timed_binding):
+        for event in events_of(timed_binding):
+            self.write(*event)
+
+    def write(self, case_id, activity, lifecycle, resource, time):
+        text = self.format(case_id, activity, lifecycle, resource, time)
+        if text:
+            self._buffer.append(text)
+        self.events += 1
+        if len(self._buffer) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes out the buffered events.
+        """
+        if self._buffer:
+            self._file.write("".join(self._buffer))
+            self._buffer = []
+
+    def close(self):
+        """
+        Writes out the buffered events and the end of the log, and closes the
+        file.
+        """
+        if self._file is None:
+            return
+        self._buffer.append(self.footer())
+        self.flush()
+        self._file.close()
+        self._file = None
+        self._closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __getstate__(self):
+        """
+        Writes out the buffered events and leaves out the file, remembering
+        how much of it was written instead.
+        """
+        if self._file is not None:
+            self.flush()
+            if self.compress:
+                # end the gzip member, later writes go into a new one
+                self._file.close()
+                self._file = self._open("at")
+            else:
+                self._file.flush()
+        state = self.__dict__.copy()
+        state["_file"] = None
+        state["_written"] = getsize(self.filename)
+        return state
+
+    def __setstate__(self, state):
+        written = state.pop("_written")
+        self.__dict__.update(state)
+        if self._closed:
+            return
+        with open(self.filename, "r+b") as f:
+            f.truncate(written)
+        self._file = self._open("at")
+
+class CSVLogWriter(EventLogWriter):
+    """
+    Writes the event log as CSV, with a row for each event.
+    """
+    COLUMNS = ("case_id", "activity", "lifecycle", "resource", "timestamp")
+
+    def __init__(self, filename, separator=",", **kwargs):
+        self.sep = separator
+        super().__init__(filename, **kwargs)
+
+    def header(self):
+        return self.sep.join(self.COLUMNS) + "\n"
+
+    def field(self, value):
+        """
+        Returns the value as a field, quoted if it holds the separator.
+        """
+        text = "" if value is None else str(value)
+        if self.sep in text or '"' in text or "\n" in text:
+            return '"' + text.replace('"', '""') + '"'
+        return text
+
+    def format(self, case_id, activity, lifecycle, resource, time):
+        return self.sep.join((
+            self.field(case_id), self.field(activity), lifecycle,
+            self.field(resource), self.timestamp(time)
+        )) + "\n"
+
+class XESLogWriter(EventLogWriter):
+    """
+    Writes the event log as XES, with a trace for each case.
+
+    As the events of a trace must be written together, the events of a case
+    are held until it reaches an end event, so memory only grows with the
+    number of cases in progress. Cases still in progress are written when
+    the log is closed.
+    """
+
+    def __init__(self, filename, **kwargs):
+        self._traces = dict()
+        super().__init__(filename, **kwargs)
+
+    def header(self):
+        return (
+            '<?xml version="1.0" encoding="UTF-8" ?>\n'
+            '<log xes.version="1.0" xes.features="nested-attributes">\n'
+            '  <extension name="Concept" prefix="concept" '
+            'uri="http://www.xes-standard.org/concept.xesext"/>\n'
+            '  <extension name="Lifecycle" prefix="lifecycle" '
+            'uri="http://www.xes-standard.org/lifecycle.xesext"/>\n'
+            '  <extension name="Organizational" prefix="org" '
+            'uri="http://www.xes-standard.org/org.xesext"/>\n'
+            '  <extension name="Time" prefix="time" '
+            'uri="http://www.xes-standard.org/time.xesext"/>\n'
+            '  <classifier name="Activity" keys="concept:name"/>\n'
+        )
+
+    def footer(self):
+        return "".join(
+            self._trace(case_id, events)
+            for case_id, events in self._traces.items()
+        ) + "</log>\n"
+
+    def timestamp(self, time):
+        if self.initial_time is None:
+            return str(time)
+        return (self.initial_time + time * self.timeunit).isoformat(
+            timespec="milliseconds"
+        )
+
+    def _trace(self, case_id, events):
+        return (
+            f'  <trace>\n    <string key="concept:name" '
+            f'value={quoteattr(str(case_id))}/>\n'
+            + "".join(events) +
+            '  </trace>\n'
+        )
+
+    def callback(self, timed_binding):
+        super().callback(timed_binding)
+        if timed_binding[2].get_id().endswith("<end_event>"):
+            case = case_of(timed_binding[0][0][1].value)
+            if case is not None:
+                self.end_trace(str(case))
+
+    def format(self, case_id, activity, lifecycle, resource, time):
+        event = (
+            '    <event>\n'
+            f'      <string key="concept:name" value={quoteattr(activity)}/>\n'
+            f'      <string key="lifecycle:transition" value="{lifecycle}"/>\n'
+        )
+        if resource is not None:
+            event += (
+                '      <string key="org:resource" '
+                f'value={quoteattr(str(resource))}/>\n'
+            )
+        event += (
+            f'      <date key="time:timestamp" value="{self.timestamp(time)}"/>\n'
+            '    </event>\n'
+        )
+        self._traces.setdefault(case_id, []).append(event)
+        return None
+
+    def end_trace(self, case_id):
+        """
+        Writes out the trace of the case, which has no more events to come.
+        """
+        events = self._traces.pop(case_id, None)
+        if events is not None:
+            self._buffer.append(self._trace(case_id, events))
+            if len(self._buffer) >= self.chunk_size:
+                self.flush()
+
+class ParquetLogWriter:
+    """
+    Writes the event log as a Parquet file, a column for each field of the 
+    events, which needs pyarrow. Logs of millions of events stay small and
+    load quickly, e.g. with `pandas.read_parquet`.
+
+    Simulation times are stored as float64, with the initial time and time
+    unit in the metadata of the file. Activities, lifecycle transitions and
+    resources are dictionary encoded, i.e. stored as integer codes into the
+    list of names seen so far. Case ids are dictionary encoded as well, but
+    per row group, as there are as many of them as cases. Events are written
+    in row groups of `chunk_size` while simulating.
+
+    Unlike the text writers, it cannot be pickled into a checkpoint as the 
+    file is only complete once closed.
+    """
+    COLUMNS = ("case_id", "activity", "lifecycle", "resource", "time")
+
+    def __init__(self, filename, chunk_size=65536,
+                 initial_time=datetime(2020, 1, 1),
+                 timeunit=timedelta(minutes=1), compression="zstd"):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("writing parquet event logs needs pyarrow") 
+        self._pa = pa
+        self.filename = filename
+        self.chunk_size = chunk_size
+        self.events = 0
+        names = pa.dictionary(pa.int32(), pa.string())
+        metadata = { "timeunit" : str(timeunit.total_seconds()) }
+        if initial_time is not None:
+            metadata["initial_time"] = initial_time.isoformat()
+        self.schema = pa.schema([
+            ("case_id", names),
+            ("activity", names),
+            ("lifecycle", names),
+            ("resource", names),
+            ("time", pa.float64()),
+        ], metadata=metadata)
+        self._writer = pq.ParquetWriter(
+            filename, self.schema, compression=compression
+        )
+        # the names seen for each encoded column and their codes
+        self._names = { column : [] for column in self.COLUMNS[1:4] }
+        self._codes = { column : dict() for column in self.COLUMNS[1:4] }
+        self._columns = { column : [] for column in self.COLUMNS }
+
+    def _encode(self, column, name):
+        if name is None:
+            return None
+        codes = self._codes[column]
+        code = codes.get(name)
+        if code is None:
+            code = codes[name] = len(codes)
+            self._names[column].append(str(name))
+        return code
+
+    def callback(self, timed_binding):
+        for event in events_of(timed_binding):
+            self.write(*event)
+
+    def write(self, case_id, activity, lifecycle, resource, time):
+        columns = self._columns
+        columns["case_id"].append(str(case_id))
+        columns["activity"].append(self._encode("activity", activity))
+        columns["lifecycle"].append(self._encode("lifecycle", lifecycle))
+        columns["resource"].append(self._encode("resource", resource))
+        columns["time"].append(time)
+        self.events += 1
+        if len(columns["time"]) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes out the buffered events as a row group.
+        """
+        pa = self._pa
+        columns = self._columns
+        if not columns["time"]:
+            return
+        arrays = [
+            pa.array(columns["case_id"], pa.string()).dictionary_encode()
+        ]
+        for column in self.COLUMNS[1:4]:
+            arrays.append(pa.DictionaryArray.from_arrays(
+                pa.array(columns[column], pa.int32()),
+                pa.array(self._names[column], pa.string())
+            ))
+        arrays.append(pa.array(columns["time"], pa.float64()))
+        self._writer.write_batch(
+            pa.RecordBatch.from_arrays(arrays, schema=self.schema),
+            row_group_size=len(columns["time"])
+        )
+        self._columns = { column : [] for column in self.COLUMNS }
+
+    def close(self):
+        """
+        Writes out the buffered events and completes the file.
+        """
+        if self._writer is None:
+            return
+        self.flush()
+        self._writer.close()
+        self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __getstate__(self):
+        raise TypeError(
+            "a parquet event log cannot be checkpointed, use a CSV or XES log"
+        )
+
+def open_log(filename, **kwargs):
+    """
+    Returns a log writer for the file, as XES if its name ends with ".xes"
+    or ".xes.gz", as Parquet if it ends with ".parquet" and as CSV otherwise.
+    Keyword arguments are passed on to the writer.
+    """
+    if filename.endswith(".parquet"):
+        return ParquetLogWriter(filename, **kwargs)
+    name = filename[:-3] if filename.endswith(".gz") else filename
+    if name.endswith(".xes"):
+        return XESLogWriter(filename, **kwargs)
+    return CSVLogWriter(filename, **kwargs)
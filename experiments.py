@@ -0,0 +1,202 @@
+"""
+Runs independent replications of a model over a grid of parameters, with
+each replication in its own process.
+
+A model comes from a factory, a function taking the parameters of the grid
+as keyword arguments and returning a fresh SimProblem, e.g. `build` in
+tut-bpmn-01.py. As the tutorials are scripts rather than modules, factories
+can be given as "path/to/script.py:function", which each worker loads for
+itself.
+
+    python experiments.py tut-bpmn-01.py:build -n 10 --agents 25 50
+
+Each point of the grid is built once, in the main process, and sent to the
+workers as a snapshot (see snapshot.py). Replications are seeded from one
+stream of seeds, so the i-th replication of every point in the grid draws
+from the same seed, and so do the streams of its variates (see variates.py),
+which gives common random numbers across the grid.
+
+Rather than from an empty model at clock 0, every point can be started from
+the state of a baseline run (see `snapshot.warm_start`), so that only the 
+period after the warm-up is simulated:
+
+    python -m headless tut-bpmn-01.py:build -d 500 --save-state steady.state
+    python experiments.py tut-bpmn-01.py:build -d 100 --agents 25 50 \\
+        --warm-start steady.state
+"""
+from concurrent.futures import ProcessPoolExecutor
+from importlib.util import spec_from_file_location, module_from_spec
+from itertools import product
+from inspect import signature, Parameter
+from os.path import abspath, basename, splitext
+from random import Random, seed as random_seed
+from time import time
+import argparse
+
+from headless import run
+from metrics import CaseKPIs, cases_in_progress, confidence_interval
+from snapshot import dumps, loads, load_state, warm_start
+from simsettings import AGENTS, BATCHED, RATE, DURATION
+
+KPIS = ("throughput", "cycle_time", "in_progress")
+
+_factories = dict()
+
+def load_factory(factory):
+    """
+    Returns the factory itself if it is callable, otherwise loads the
+    function named in "path/to/script.py:function" from the script.
+    """
+    if callable(factory):
+        return factory
+    if factory not in _factories:
+        path, _, name = factory.rpartition(":")
+        module_name = splitext(basename(path))[0].replace("-", "_")
+        spec = spec_from_file_location(module_name, abspath(path))
+        module = module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _factories[factory] = getattr(module, name)
+    return _factories[factory]
+
+def accepted(factory, grid):
+    """
+    Returns the grid without the parameters the factory does not take, e.g.
+    `batched` for a model that does not batch its arrivals. A parameter it
+    does not take can only be left out if it has a single value.
+    """
+    params = signature(factory).parameters
+    if any(p.kind == Parameter.VAR_KEYWORD for p in params.values()):
+        return grid
+    kept = dict()
+    for name, values in grid.items():
+        if name in params:
+            kept[name] = values
+        elif len(values) > 1:
+            raise ValueError(
+                f"the factory takes no parameter {name} to vary over {values}"
+            )
+    return kept
+
+def replicate(model, seed, duration):
+    """
+    Loads the snapshot of a model and simulates it for the duration from
+    its clock, after seeding the random module. Returns the KPIs of the run.
+    """
+    problem = loads(model)
+    random_seed(seed)
+    if getattr(problem, "variates", None) is not None:
+        problem.variates.seed(seed)
+    kpis = CaseKPIs(problem)
+    start = problem.clock
+    run(problem, start + duration, kpis, progress_interval=None)
+    return {
+        "throughput" : kpis.throughput(min(problem.clock - start, duration)),
+        "cycle_time" : kpis.mean_cycle_time(),
+        "in_progress" : cases_in_progress(problem),
+    }
+
+def seeds(base_seed, replications):
+    """
+    Returns a seed for each replication, drawn from a stream seeded by
+    `base_seed`.
+    """
+    stream = Random(base_seed)
+    return [ stream.getrandbits(64) for _ in range(replications) ]
+
+def run_experiment(factory, grid=None, replications=10, duration=DURATION,
+                   base_seed=42, workers=None, state=None):
+    """
+    Runs the replications for every combination of parameters in the grid,
+    a mapping from the name of a factory parameter to the values to try,
+    across a pool of worker processes.
+
+    :param factory: a function returning a model for the parameters, or
+    "path/to/script.py:function". Parameters of the grid it does not take
+    are left out, see `accepted`.
+    :param workers: the number of processes, defaults to the cpu count.
+    :param state: a state to start each point from, see 
+    `snapshot.capture_state`, in which case the duration is simulated from
+    the clock of the state onwards.
+    :returns: a list with a row for each point in the grid, mapping each
+    parameter to its value and each KPI to its mean and the half-width of
+    its 95% confidence interval over the replications.
+    """
+    if grid is None:
+        grid = { "agents" : [AGENTS], "batched" : [BATCHED], "rate" : [RATE] }
+    factory = load_factory(factory)
+    grid = accepted(factory, grid)
+    names = list(grid.keys())
+    points = [ dict(zip(names, values)) for values in product(*grid.values()) ]
+    run_seeds = seeds(base_seed, replications)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = []
+        for params in points:
+            problem = factory(**params)
+            if state is not None:
+                warm_start(problem, state)
+            model = dumps(problem)
+            futures.append([
+                pool.submit(replicate, model, seed, duration)
+                for seed in run_seeds
+            ])
+        rows = []
+        for params, runs in zip(points, futures):
+            results = [ future.result() for future in runs ]
+            row = dict(params)
+            for kpi in KPIS:
+                row[kpi] = confidence_interval(
+                    [ result[kpi] for result in results ]
+                )
+            rows.append(row)
+    return rows
+
+def print_rows(rows):
+    def fmt(value):
+        mean, half = value
+        if mean is None:
+            return "-"
+        if half is None:
+            return f"{mean:.3f}"
+        return f"{mean:.3f} ± {half:.3f}"
+
+    for row in rows:
+        params = ", ".join(
+            f"{k}={v}" for k, v in row.items() if k not in KPIS
+        )
+        kpis = ", ".join(f"{kpi}={fmt(row[kpi])}" for kpi in KPIS)
+        print(f"{params} :: {kpis}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Runs independent replications of a model in parallel."
+    )
+    parser.add_argument("factory",
+        help="the model factory as path/to/script.py:function")
+    parser.add_argument("-n", "--replications", type=int, default=10)
+    parser.add_argument("-d", "--duration", type=float, default=DURATION)
+    parser.add_argument("-s", "--seed", type=int, default=42)
+    parser.add_argument("-w", "--workers", type=int, default=None)
+    parser.add_argument("--agents", type=int, nargs="+", default=[AGENTS])
+    parser.add_argument("--batched", type=int, nargs="+", default=[BATCHED])
+    parser.add_argument("--rate", type=float, nargs="+", default=[RATE])
+    parser.add_argument("--warm-start", default=None,
+        help="a state file to start every point from")
+    args = parser.parse_args()
+
+    start = time()
+    rows = run_experiment(
+        args.factory,
+        grid={
+            "agents" : args.agents,
+            "batched" : args.batched,
+            "rate" : args.rate
+        },
+        replications=args.replications,
+        duration=args.duration,
+        base_seed=args.seed,
+        workers=args.workers,
+        state=load_state(args.warm_start) if args.warm_start else None,
+    )
+    print_rows(rows)
+    print(f"experiment took {time() - start:.3f} seconds...")
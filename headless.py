@@ -0,0 +1,217 @@
+"""
+Simulates a model as fast as possible without the visualiser, e.g. for
+batch runs on machines without a display.
+
+    python -m headless tut-bpmn-01.py:build -d 2270 --agents 25
+
+Progress is written to stderr every few seconds of wall-clock time rather
+than on every step. Long runs can write checkpoints and be resumed from
+them, e.g. after an interruption or to run in slices of time:
+
+    python -m headless tut-bpmn-01.py:build -d 1000 -c run.checkpoint
+    python -m headless -r run.checkpoint -d 2270
+
+The state at the end of a run can be saved as the starting point of what-if
+experiments, see `snapshot.warm_start`:
+
+    python -m headless tut-bpmn-01.py:build -d 500 --save-state steady.state
+
+An event log of the run can be written with `-l sim.csv` or `-l sim.xes.gz`,
+see eventlog.py.
+"""
+from sys import stderr
+from signal import signal, SIGINT
+from threading import current_thread, main_thread
+from time import perf_counter as now
+import argparse
+
+from bpmn import HelperBPMNStart
+from metrics import has_cases
+from snapshot import save_checkpoint, load_checkpoint
+
+# the events after which the model may have drained
+DRAINING_EVENTS = ("<start_event>", "<end_event>")
+
+def is_drained(problem):
+    """
+    Returns True if no cases are left in the problem and none of its start 
+    events will generate any more.
+    """
+    for prototype in problem.prototypes:
+        if isinstance(prototype, HelperBPMNStart):
+            if any(len(place.marking) > 0 for place in prototype.places):
+                return False
+    return not has_cases(problem)
+
+def run(problem, duration, reporter=None, progress_interval=5.0,
+        until_drained=False, out=stderr, checkpoint=None,
+        checkpoint_interval=300.0, steps=0):
+    """
+    Simulates the problem until its clock passes the duration or nothing
+    can happen anymore.
+
+    :param reporter: a reporter, or list of reporters, called with every
+    binding that fired.
+    :param progress_interval: seconds of wall-clock time between progress
+    lines written to `out`, or None for no progress.
+    :param until_drained: if True, also stop once no cases are left in the
+    model and no more will arrive, see `is_drained`. This is checked after
+    start and end events.
+    :param checkpoint: a file to write a checkpoint to (see 
+    `snapshot.save_checkpoint`) every `checkpoint_interval` seconds of 
+    wall-clock time, on ctrl-c and at the end of the run. Resume from it
+    with `resume`.
+    :param steps: the number of steps already taken, e.g. before resuming.
+    :returns: the number of steps taken, including `steps`.
+    """
+    reporters = []
+    if reporter is not None:
+        reporters = reporter if type(reporter) == list else [reporter]
+    step = problem.step
+    start = now()
+    first = steps
+    next_progress = None
+    if progress_interval is not None:
+        next_progress = start + progress_interval
+    next_checkpoint = None
+    interrupted = []
+    if checkpoint is not None:
+        next_checkpoint = start + checkpoint_interval
+        # interrupts are held off until the step is complete, so that the
+        # checkpoint written for them is consistent
+        if current_thread() is main_thread():
+            handler = signal(SIGINT, lambda *args: interrupted.append(args))
+    try:
+        while problem.clock <= duration and not interrupted:
+            timed_binding = step()
+            if timed_binding is None:
+                break
+            steps += 1
+            for r in reporters:
+                r.callback(timed_binding)
+            if until_drained \
+                and timed_binding[2].get_id().endswith(DRAINING_EVENTS) \
+                and is_drained(problem):
+                break
+            if next_progress is not None and now() >= next_progress:
+                elapsed = now() - start
+                print(
+                    f"simulated {problem.clock:.1f}/{duration} "
+                    f"in {elapsed:.1f}s ({steps} steps, "
+                    f"{(steps - first)/elapsed:.0f} steps/s)",
+                    file=out
+                )
+                next_progress = now() + progress_interval
+            if next_checkpoint is not None and now() >= next_checkpoint:
+                save_checkpoint(checkpoint, problem, reporters, steps=steps)
+                next_checkpoint = now() + checkpoint_interval
+        if checkpoint is not None:
+            save_checkpoint(checkpoint, problem, reporters, steps=steps)
+    finally:
+        if checkpoint is not None and current_thread() is main_thread():
+            signal(SIGINT, handler)
+    if interrupted:
+        raise KeyboardInterrupt(f"interrupted, checkpoint saved to {checkpoint}")
+    return steps
+
+def resume(filename, duration, **kwargs):
+    """
+    Continues the simulation in the checkpoint file until the duration,
+    taking the same steps as the run it came from would have. Further 
+    keyword arguments are passed on to `run`, and by default new checkpoints
+    are written to the same file. Returns the problem, its reporters and the
+    number of steps taken in total.
+    """
+    saved = load_checkpoint(filename)
+    problem = saved["problem"]
+    reporters = saved["reporters"] or []
+    kwargs.setdefault("checkpoint", filename)
+    steps = run(problem, duration, reporters, steps=saved["steps"], **kwargs)
+    return problem, reporters, steps
+
+if __name__ == "__main__":
+    from experiments import load_factory, accepted
+    from eventlog import open_log
+    from metrics import CaseKPIs, QueueStats
+    from random import seed
+
+    parser = argparse.ArgumentParser(
+        description="Simulates a model without the visualiser."
+    )
+    parser.add_argument("factory", nargs="?",
+        help="the model factory as path/to/script.py:function")
+    parser.add_argument("-d", "--duration", type=float, required=True)
+    parser.add_argument("-c", "--checkpoint", default=None,
+        help="file to write checkpoints to")
+    parser.add_argument("--checkpoint-every", type=float, default=300.0,
+        help="seconds between checkpoints")
+    parser.add_argument("-r", "--resume", default=None,
+        help="checkpoint file to resume from instead of a factory")
+    parser.add_argument("-s", "--seed", type=int, default=42)
+    parser.add_argument("-p", "--progress", type=float, default=5.0,
+        help="seconds between progress lines")
+    parser.add_argument("-l", "--log", default=None,
+        help="file to write the event log to, as .csv, .xes (.gz) or .parquet")
+    parser.add_argument("-q", "--queue-stats", default=None,
+        help="file to write statistics on the queues to, as JSON")
+    parser.add_argument("--save-state", default=None,
+        help="file to write the state at the end of the run to")
+    parser.add_argument("--until-drained", action="store_true",
+        help="stop once no cases are left in the model")
+    parser.add_argument("--agents", type=int, default=None)
+    parser.add_argument("--batched", type=int, default=None)
+    parser.add_argument("--rate", type=float, default=None)
+    args = parser.parse_args()
+
+    params = {
+        name : value
+        for name, value
+        in [ ("agents", args.agents), ("batched", args.batched),
+             ("rate", args.rate) ]
+        if value is not None
+    }
+    options = dict(
+        progress_interval=args.progress,
+        until_drained=args.until_drained,
+        checkpoint_interval=args.checkpoint_every
+    )
+    start = now()
+    if args.resume is not None:
+        problem, reporters, steps = resume(args.resume, args.duration,
+            checkpoint=args.checkpoint or args.resume, **options)
+    elif args.factory is None:
+        parser.error("either a factory or a checkpoint to resume is needed")
+    else:
+        factory = load_factory(args.factory)
+        unknown = params.keys() - accepted(
+            factory, { name : [value] for name, value in params.items() }
+        ).keys()
+        if unknown:
+            parser.error(
+                f"{args.factory} takes no parameter {', '.join(sorted(unknown))}"
+            )
+        seed(args.seed)
+        problem = factory(**params)
+        reporters = [CaseKPIs(problem)]
+        if args.log is not None:
+            reporters.append(open_log(args.log))
+        if args.queue_stats is not None:
+            reporters.append(QueueStats(problem))
+        steps = run(problem, args.duration, reporters, 
+                    checkpoint=args.checkpoint, **options)
+    end = now() - start
+    kpis = reporters[0]
+    for reporter in reporters[1:]:
+        if isinstance(reporter, QueueStats):
+            reporter.save(args.queue_stats or "queues.json", problem)
+        else:
+            reporter.close()
+    if args.save_state is not None:
+        from snapshot import save_state
+        save_state(args.save_state, problem)
+    print(f"simulation took {end:.3f} seconds for {steps} steps...")
+    print(f"completed {kpis.completed} cases by {problem.clock:.2f}", end="")
+    if kpis.completed:
+        print(f", with a mean cycle time of {kpis.mean_cycle_time():.3f}")
+    else:
+        print()
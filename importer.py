@@ -0,0 +1,449 @@
+"""
+Compiles a BPMN model, as exported by e.g. the Camunda Modeler, into a
+SimProblem made from the helpers in bpmn.py.
+
+    from importer import load_bpmn
+    problem = load_bpmn("models/pre-robodebt.bpmn")
+
+The XML is read with an iterative parser, keeping only the flow nodes and
+sequence flows of the processes. These are mapped onto the `TYPES` of
+bpmn.py as follows:
+
+- start events of a process generate cases ("start"), end events consume
+  them ("end");
+- tasks take a resource from the pool of their lane, or the pool named
+  after the participant without lanes ("task", "resource-pool");
+- exclusive and event-based gateways split ("gat-ex-split") or join
+  ("gat-ex-join") the flow of cases;
+- intermediate catch and throw events delay cases ("event");
+- sub-processes are flattened, cases enter at their start event and leave
+  from their end events. A signal end event caught by a boundary event on
+  its sub-process leaves along the outgoing flow of the boundary event.
+  Sub-processes without content are treated as tasks. Other boundary
+  events are left out;
+- a task with many outgoing flows only continues along the first;
+- a signal start event is triggered by a copy of each case passing a
+  signal throw event with the same signal.
+
+Durations, delays, arrivals, pool sizes and branching probabilities come
+from a sidecar parameter file, the json file next to the model with the
+same name (e.g. models/pre-robodebt.json), see `DEFAULT_PARAMS`. Nodes are
+looked up in it by name or by id. Names are made unique by suffixing the id
+of any node whose name is used before. Each task, event and gateway draws
+from its own stream of `problem.variates`, by its name.
+
+Parsing is cached in a __pycache__ folder next to the model, so that
+re-runs only redo the parse when the model file changed.
+"""
+from xml.etree.ElementTree import iterparse
+from os.path import exists, getmtime, getsize, join, dirname, basename, splitext
+from os import makedirs
+import pickle
+import json
+
+from simpn.simulator import SimToken
+from bpmn import BPMN
+from util import (ParallelSimProblem, PriorityScheduler, pick_time,
+                  increment_priority)
+from variates import Variates
+
+NS = "{http://www.omg.org/spec/BPMN/20100524/MODEL}"
+
+TASKS = ("task", "userTask", "manualTask", "serviceTask", "sendTask",
+         "receiveTask", "scriptTask", "businessRuleTask", "callActivity")
+EVENTS = ("intermediateCatchEvent", "intermediateThrowEvent")
+GATEWAYS = ("exclusiveGateway", "eventBasedGateway")
+FLOW_NODES = TASKS + EVENTS + GATEWAYS + (
+    "startEvent", "endEvent", "boundaryEvent", "subProcess"
+)
+
+DEFAULT_PARAMS = {
+    # cases per batch, time between batches and total cases per start event
+    "starts" : { "*" : { "interarrival" : 1.0, "amount" : 1, "limit" : None } },
+    # mean and deviation of the duration of tasks, see util.pick_time
+    "tasks" : { "*" : { "mean" : 1.0, "dev" : None } },
+    # mean and deviation of the delay of intermediate events
+    "events" : { "*" : { "mean" : 0.0, "dev" : None } },
+    # weights of the outgoing flows of gateways, by the name of the flow or
+    # the node it leads to, flows left out are equally likely
+    "gateways" : { "*" : {} },
+    # number of resources in each pool, by the name of the lane
+    "resources" : { "*" : 25 },
+}
+
+CACHE_VERSION = 1
+
+class Node:
+    """
+    A flow node of a process, as read from the XML.
+    """
+
+    def __init__(self, id, kind, name, parent):
+        self.id = id
+        self.kind = kind
+        self.name = name
+        self.parent = parent
+        self.incoming = []
+        self.outgoing = []
+        self.definition = None
+        self.signal = None
+        self.attached = None
+        self.lane = None
+        self.children = []
+
+    def __repr__(self):
+        return f"Node({self.kind}, {self.name!r}, {self.id})"
+
+def _tag(elem):
+    return elem.tag[len(NS):] if elem.tag.startswith(NS) else None
+
+def _clean(name):
+    if name is None:
+        return None
+    name = " ".join(name.split())
+    return name or None
+
+def parse_bpmn(filename):
+    """
+    Reads the flow nodes, sequence flows and lanes of the processes in the
+    BPMN file. Returns the nodes by id, the flows as (id, name, source,
+    target) by id and the names of the participants by process id.
+    """
+    nodes = dict()
+    flows = dict()
+    participants = dict()
+    lane_of = dict()
+    stack = []
+    lanes = []
+    for event, elem in iterparse(filename, events=("start", "end")):
+        tag = _tag(elem)
+        if tag is None:
+            if event == "end":
+                elem.clear()
+            continue
+        if event == "start":
+            if tag in FLOW_NODES:
+                parent = stack[-1].id if stack else None
+                node = Node(elem.get("id"), tag, _clean(elem.get("name")), parent)
+                node.attached = elem.get("attachedToRef")
+                if stack:
+                    stack[-1].children.append(node.id)
+                nodes[node.id] = node
+                stack.append(node)
+            elif tag == "lane":
+                lanes.append(_clean(elem.get("name")) or elem.get("id"))
+            elif tag == "process":
+                stack.clear()
+            continue
+        # end of an element
+        if tag in FLOW_NODES:
+            stack.pop()
+            elem.clear()
+        elif tag == "incoming" and stack:
+            stack[-1].incoming.append(elem.text.strip())
+        elif tag == "outgoing" and stack:
+            stack[-1].outgoing.append(elem.text.strip())
+        elif tag.endswith("EventDefinition") and stack:
+            stack[-1].definition = tag[:-len("EventDefinition")]
+            stack[-1].signal = elem.get("signalRef") or elem.get("messageRef")
+        elif tag == "flowNodeRef" and lanes:
+            lane_of[elem.text.strip()] = lanes[-1]
+        elif tag == "lane":
+            lanes.pop()
+        elif tag == "sequenceFlow":
+            flows[elem.get("id")] = (
+                elem.get("id"), _clean(elem.get("name")),
+                elem.get("sourceRef"), elem.get("targetRef")
+            )
+            elem.clear()
+        elif tag == "participant" and elem.get("processRef"):
+            participants[elem.get("processRef")] = _clean(elem.get("name"))
+    # lanes list nodes before they are read, and nodes in a sub-process
+    # belong to the lane of the sub-process
+    for id, lane in lane_of.items():
+        if id in nodes:
+            nodes[id].lane = lane
+    for node in nodes.values():
+        parent = node
+        while parent.lane is None and parent.parent is not None:
+            parent = nodes[parent.parent]
+        node.lane = parent.lane
+    return nodes, flows, participants
+
+def flatten(nodes):
+    """
+    Rewires the nodes in place so that sub-processes with content are
+    replaced by their content, see the module docstring. Nodes that drop
+    out of the process are removed.
+    """
+    removed = set()
+    for sub in [ n for n in nodes.values() if n.kind == "subProcess" ]:
+        if not sub.children:
+            sub.kind = "task"
+            continue
+        children = [ nodes[c] for c in sub.children ]
+        boundaries = {
+            (n.signal or n.name) : n for n in nodes.values()
+            if n.kind == "boundaryEvent" and n.attached == sub.id
+        }
+        starts = [ n for n in children
+                   if n.kind == "startEvent" and not n.incoming ]
+        if starts:
+            entry = starts[0]
+            entry.kind = "intermediateCatchEvent"
+            entry.incoming = list(sub.incoming)
+            removed.update(n.id for n in starts[1:])
+        for end in [ n for n in children if n.kind == "endEvent" ]:
+            boundary = boundaries.get(end.signal or end.name) \
+                if end.definition == "signal" else None
+            if boundary is not None:
+                end.kind = "intermediateThrowEvent"
+                end.definition = None
+                end.outgoing = list(boundary.outgoing)
+            elif sub.outgoing:
+                end.kind = "intermediateThrowEvent"
+                end.outgoing = list(sub.outgoing)
+        removed.add(sub.id)
+    removed.update(
+        n.id for n in nodes.values() if n.kind == "boundaryEvent"
+    )
+    for id in removed:
+        nodes.pop(id, None)
+    for node in nodes.values():
+        node.children = [ c for c in node.children if c in nodes ]
+    return nodes
+
+def _cache_file(filename):
+    stem = basename(filename)
+    return join(dirname(filename) or ".", "__pycache__", stem + ".pickle")
+
+def read_bpmn(filename, cache=True):
+    """
+    Parses and flattens the BPMN file, reusing the cached result if the
+    file has not changed since.
+    """
+    key = (CACHE_VERSION, getmtime(filename), getsize(filename))
+    cached = _cache_file(filename)
+    if cache and exists(cached):
+        with open(cached, "rb") as f:
+            try:
+                stored_key, result = pickle.load(f)
+                if stored_key == key:
+                    return result
+            except Exception:
+                pass
+    nodes, flows, participants = parse_bpmn(filename)
+    result = (flatten(nodes), flows, participants)
+    if cache:
+        makedirs(dirname(cached), exist_ok=True)
+        with open(cached, "wb") as f:
+            pickle.dump((key, result), f)
+    return result
+
+def read_params(sidecar=None):
+    """
+    Returns the parameters in the sidecar file, if given and it exists, on
+    top of `DEFAULT_PARAMS`.
+    """
+    values = dict()
+    if sidecar is not None and exists(sidecar):
+        with open(sidecar, "r") as f:
+            values = json.load(f)
+    return with_defaults(values)
+
+def with_defaults(params):
+    """
+    Returns the given parameters on top of `DEFAULT_PARAMS`.
+    """
+    result = { section : dict(values) for section, values in DEFAULT_PARAMS.items() }
+    for section, values in params.items():
+        result.setdefault(section, dict()).update(values)
+    return result
+
+def _lookup(params, section, node):
+    values = params[section]
+    default = values.get("*")
+    found = values.get(node.id, values.get(node.name, default))
+    if isinstance(default, dict) and isinstance(found, dict):
+        return { **default, **found }
+    return found
+
+def _task_behaviour(mean, dev, stream):
+    def behaviour(c, r):
+        c = increment_priority(c)
+        return [SimToken((c, r), delay=pick_time(mean, dev, stream))]
+    return behaviour
+
+def _event_behaviour(mean, dev, copies, stream=None):
+    def behaviour(c):
+        c = increment_priority(c)
+        delay = pick_time(mean, dev, stream) if mean > 0 else 0
+        return [ SimToken(c, delay=delay) for _ in range(copies) ]
+    return behaviour
+
+def _gateway_choice(weights, stream):
+    total = sum(weights)
+    def choice(c):
+        pick = stream.uniform(0, total)
+        outputs = [ None ] * len(weights)
+        for i, weight in enumerate(weights):
+            pick -= weight
+            if pick <= 0 or i == len(weights) - 1:
+                outputs[i] = SimToken(c)
+                return outputs
+    return choice
+
+def _interarrival(value):
+    return lambda: value
+
+def compile_bpmn(filename, params=None, cache=True, problem=None):
+    """
+    Compiles the BPMN file into a SimProblem, see the module docstring.
+
+    :param params: the parameters to use, on top of `DEFAULT_PARAMS`, by
+    default read from the sidecar file of the model.
+    :param cache: whether to reuse (and store) the parsed model.
+    :param problem: the problem to add the model to, by default a new
+    `ParallelSimProblem` that prioritises the cases of the first start event.
+    :returns: the problem.
+    """
+    nodes, flows, participants = read_bpmn(filename, cache=cache)
+    if params is None:
+        params = read_params(splitext(filename)[0] + ".json")
+    else:
+        params = with_defaults(params)
+
+    # unique names for nodes, in the order they were read
+    names = dict()
+    for node in nodes.values():
+        name = node.name or node.id
+        if name in names.values():
+            name = f"{name} ({node.id})"
+        names[node.id] = name
+
+    # a place for each flow, nodes with many incoming flows read from one
+    flow_place = dict()
+    for id, name, source, target in flows.values():
+        flow_place[id] = name if name and name not in flow_place.values() \
+            else id
+    for node in nodes.values():
+        if len(node.incoming) > 1 and node.kind not in GATEWAYS:
+            for flow in node.incoming:
+                flow_place[flow] = f"{names[node.id]} queue"
+
+    def places(flow_ids, node):
+        result = []
+        for flow in flow_ids:
+            place = flow_place.get(flow, flow)
+            if place not in result:
+                result.append(place)
+        return result or [f"{names[node.id]} sink"]
+
+    starts = [ n for n in nodes.values()
+               if n.kind == "startEvent" and n.definition != "signal" ]
+    if problem is None:
+        problem = ParallelSimProblem(
+            binding_priority=PriorityScheduler(
+                names[starts[0].id] if starts else None
+            )
+        )
+    if getattr(problem, "variates", None) is None:
+        problem.variates = Variates()
+    stream = problem.variates.stream
+
+    # signals thrown to signal start events
+    signals = {
+        n.signal or n.name : f"signal {n.signal or n.name}"
+        for n in nodes.values()
+        if n.kind == "startEvent" and n.definition == "signal"
+    }
+
+    # resource pools for the lanes, or the participant without lanes
+    default_pool = next(iter(participants.values()), None) or "resources"
+    pools = { node.lane or default_pool for node in nodes.values()
+              if node.kind in TASKS }
+    for pool in sorted(pools):
+        amount = params["resources"].get(pool, params["resources"]["*"])
+        type(pool, (BPMN,), {
+            "type" : "resource-pool", "model" : problem,
+            "name" : pool, "amount" : amount
+        })
+
+    for node in nodes.values():
+        name = names[node.id]
+        incoming = places(node.incoming, node)
+        outgoing = places(node.outgoing, node)
+        attrs = { "model" : problem, "name" : name }
+        if node.kind == "startEvent" and node.definition == "signal":
+            delay = _lookup(params, "events", node)
+            attrs.update(type="event",
+                incoming=[signals[node.signal or node.name]],
+                outgoing=outgoing[:1],
+                behaviour=staticmethod(_event_behaviour(delay["mean"], delay["dev"], 1, stream(name))))
+        elif node.kind == "startEvent":
+            start = _lookup(params, "starts", node)
+            attrs.update(type="start", outgoing=outgoing[:1],
+                amount=start["amount"], limit=start["limit"],
+                interarrival_time=staticmethod(_interarrival(start["interarrival"])))
+        elif node.kind == "endEvent" and (node.signal or node.name) in signals \
+            and node.definition == "signal":
+            attrs.update(type="event", incoming=incoming,
+                outgoing=[signals[node.signal or node.name]],
+                behaviour=staticmethod(_event_behaviour(0, None, 1)))
+        elif node.kind == "endEvent":
+            attrs.update(type="end", incoming=incoming)
+        elif node.kind in TASKS:
+            duration = _lookup(params, "tasks", node)
+            pool = node.lane or default_pool
+            attrs.update(type="task", incoming=incoming + [pool],
+                outgoing=outgoing[:1] + [pool],
+                behaviour=staticmethod(_task_behaviour(duration["mean"], duration["dev"], stream(name))))
+        elif node.kind in GATEWAYS and len(outgoing) > 1:
+            if len(incoming) > 1:
+                # join into one place first
+                joined = f"{name} join"
+                type(f"{name} join", (BPMN,), {
+                    "type" : "gat-ex-join", "model" : problem,
+                    "name" : joined, "incoming" : incoming,
+                    "outgoing" : [f"{joined} queue"]
+                })
+                incoming = [f"{joined} queue"]
+            weights = _lookup(params, "gateways", node)
+            attrs.update(type="gat-ex-split", incoming=incoming,
+                outgoing=outgoing,
+                choice=staticmethod(_gateway_choice([
+                    float(weights.get(
+                        flows[flow][1] or "",
+                        weights.get(names.get(flows[flow][3], ""), 1)
+                    ))
+                    for flow in node.outgoing
+                ], stream(name))))
+        elif node.kind in GATEWAYS and len(incoming) > 1:
+            attrs.update(type="gat-ex-join", incoming=incoming,
+                outgoing=outgoing)
+        else:
+            # intermediate events and pass-through gateways
+            delay = _lookup(params, "events", node)
+            if node.kind in GATEWAYS:
+                delay = { "mean" : 0, "dev" : None }
+            signal = node.signal or node.name
+            throws = node.kind == "intermediateThrowEvent" \
+                and node.definition == "signal" and signal in signals
+            if throws:
+                outgoing = outgoing[:1] + [signals[signal]]
+            attrs.update(type="event", incoming=incoming,
+                outgoing=outgoing,
+                behaviour=staticmethod(_event_behaviour(
+                    delay["mean"], delay["dev"], len(outgoing), stream(name)
+                )))
+        type(name, (BPMN,), attrs)
+    return problem
+
+def load_bpmn(filename, params=None, cache=True):
+    """
+    Returns a new SimProblem for the BPMN file, see `compile_bpmn`. The
+    parameters may also be given as the filename of a json file.
+    """
+    if isinstance(params, str):
+        params = read_params(params)
+    return compile_bpmn(filename, params=params, cache=cache)
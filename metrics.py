@@ -0,0 +1,487 @@
+from collections import deque
+from math import ceil, log, sqrt
+import csv
+import json
+
+from util import Case
+
+PHASES = ("bindings", "priority", "firing")
+
+class TimingCollector:
+    """
+    Collects how long each phase of a simulation step took, i.e. computing
+    the bindings, picking one by priority and firing it.
+
+    Durations (in seconds) are kept in ring buffers of the last `size` steps
+    per phase, from which percentiles can be asked for while simulating, 
+    along with the total duration of each phase over all steps.
+    Optionally, every step is also written as a row to a CSV file at `sink`,
+    which `timing-vis.py` can plot.
+
+    Attach to a problem with `ParallelSimProblem(timings=TimingCollector())`
+    or by setting `problem.timings`; without one, steps are not timed.
+    """
+
+    def __init__(self, size=10000, sink=None):
+        self.steps = 0
+        self.totals = { phase : 0.0 for phase in PHASES }
+        self._buffers = { phase : deque(maxlen=size) for phase in PHASES }
+        self._file = None
+        self._writer = None
+        if sink is not None:
+            self._file = open(sink, "w", newline="")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(("step",) + PHASES)
+
+    def record(self, bindings, priority=0.0, firing=0.0):
+        """
+        Records the durations of the phases of a single step.
+        """
+        self.steps += 1
+        totals = self.totals
+        totals["bindings"] += bindings
+        totals["priority"] += priority
+        totals["firing"] += firing
+        self._buffers["bindings"].append(bindings)
+        self._buffers["priority"].append(priority)
+        self._buffers["firing"].append(firing)
+        if self._writer is not None:
+            self._writer.writerow((self.steps, bindings, priority, firing))
+
+    def durations(self, phase):
+        """
+        Returns the buffered durations of the given phase, oldest first.
+        """
+        return list(self._buffers[phase])
+
+    def percentiles(self, phase, qs=(50, 90, 99)):
+        """
+        Returns a mapping of each percentile in `qs` to the duration of the
+        given phase at that percentile, over the buffered steps.
+        """
+        data = sorted(self._buffers[phase])
+        if not data:
+            return { q : None for q in qs }
+        return {
+            q : data[min(len(data) - 1, int(round(q / 100 * (len(data) - 1))))]
+            for q in qs
+        }
+
+    def summary(self):
+        """
+        Returns the mean, max and 50/90/99th percentiles of each phase over
+        the buffered steps.
+        """
+        result = dict()
+        for phase in PHASES:
+            data = self._buffers[phase]
+            stats = {
+                "mean" : sum(data) / len(data) if data else None,
+                "max" : max(data) if data else None,
+            }
+            for q, value in self.percentiles(phase).items():
+                stats[f"p{q}"] = value
+            result[phase] = stats
+        return result
+
+    def print_summary(self):
+        for phase, stats in self.summary().items():
+            if stats["mean"] is None:
+                continue
+            print(
+                f"{phase:>8} took mean {stats['mean']*1000:0.3f}ms "
+                f"p50 {stats['p50']*1000:0.3f}ms "
+                f"p90 {stats['p90']*1000:0.3f}ms "
+                f"p99 {stats['p99']*1000:0.3f}ms "
+                f"max {stats['max']*1000:0.3f}ms"
+            )
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._writer = None
+
+def read_timings(filename):
+    """
+    Reads a CSV file written by a `TimingCollector` sink, returning a mapping
+    of each phase to its list of durations in seconds.
+    """
+    result = { phase : [] for phase in PHASES }
+    with open(filename, "r", newline="") as f:
+        for row in csv.DictReader(f):
+            for phase in PHASES:
+                result[phase].append(float(row[phase]))
+    return result
+
+def case_of(value):
+    """
+    Returns the case in a token value, which is either the case itself or a
+    tuple with the case first (e.g. a case with its resource), else None.
+    """
+    if isinstance(value, Case):
+        return value
+    if isinstance(value, tuple) and len(value) > 0 \
+        and isinstance(value[0], Case):
+        return value[0]
+    return None
+
+class QuantileSketch:
+    """
+    A summary of a stream of non-negative values, e.g. cycle times, from
+    which quantiles and histograms can be read with a relative error of at
+    most `accuracy`.
+
+    Values are counted in buckets with geometrically growing bounds, so the
+    number of buckets only grows with the logarithm of the range of the 
+    values rather than with the number of values.
+    """
+
+    def __init__(self, accuracy=0.01):
+        self.accuracy = accuracy
+        self._gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = log(self._gamma)
+        self.buckets = dict()
+        self.zeros = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        if value <= 0:
+            self.zeros += 1
+            return
+        key = ceil(log(value) / self._log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+
+    def mean(self):
+        if self.count == 0:
+            return None
+        return self.total / self.count
+
+    def _bucket_value(self, key):
+        # the value within the relative accuracy of the whole bucket
+        value = 2 * self._gamma ** key / (self._gamma + 1)
+        return min(max(value, self.min), self.max)
+
+    def _counts(self):
+        """
+        Yields the value and count of each bucket, smallest first.
+        """
+        if self.zeros:
+            yield 0.0, self.zeros
+        for key in sorted(self.buckets):
+            yield self._bucket_value(key), self.buckets[key]
+
+    def quantile(self, q):
+        """
+        Returns the value at the quantile `q` (between 0 and 1), or None if
+        no values were added.
+        """
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for value, count in self._counts():
+            seen += count
+            if seen > rank:
+                return value
+        return self.max
+
+    def histogram(self, bins=10):
+        """
+        Returns a list of (low, high, count) for `bins` bins of equal width 
+        between the smallest and largest value.
+        """
+        if self.count == 0:
+            return []
+        width = (self.max - self.min) / bins or 1.0
+        counts = [0] * bins
+        for value, count in self._counts():
+            counts[min(bins - 1, int((value - self.min) / width))] += count
+        return [
+            (self.min + i * width, self.min + (i + 1) * width, count)
+            for i, count in enumerate(counts)
+        ]
+
+class CompletionStats:
+    """
+    Running totals of the cases completed, i.e. their number, the time of
+    the last and a sketch of their cycle times since arriving at their 
+    start event, which take the same memory however many cases complete.
+    """
+
+    def __init__(self, accuracy=0.01):
+        self.completed = 0
+        self.total_cycle_time = 0.0
+        self.max_cycle_time = 0.0
+        self.last_completion = None
+        self.cycle_times = QuantileSketch(accuracy)
+
+    def record(self, case, time):
+        """
+        Counts the case as completed at the given time.
+        """
+        self.completed += 1
+        self.last_completion = time
+        if case is not None and case.arrival is not None:
+            cycle_time = time - case.arrival
+            self.total_cycle_time += cycle_time
+            self.max_cycle_time = max(self.max_cycle_time, cycle_time)
+            self.cycle_times.add(cycle_time)
+
+    def mean_cycle_time(self):
+        """
+        Returns the mean cycle time of the completed cases that had an 
+        arrival time, or None if there are none.
+        """
+        if self.cycle_times.count == 0:
+            return None
+        return self.total_cycle_time / self.cycle_times.count
+
+    def throughput(self, duration):
+        """
+        Returns the number of cases completed per unit of simulated time.
+        """
+        if duration <= 0:
+            return None
+        return self.completed / duration
+
+class CaseKPIs(CompletionStats):
+    """
+    A reporter that keeps running totals of the cases leaving the model
+    through any of its end events, see `CompletionStats`.
+
+    Pass it as (one of) the reporters to `simulate`, or call `callback` with
+    each binding that fired.
+
+    :param problem: the problem it reports on, whose clock when a binding
+    fired is the time the case completed, as in `HelperBPMNEnd.complete`. 
+    Without it, that is the time the binding was enabled.
+    """
+
+    def __init__(self, problem=None, accuracy=0.01):
+        super().__init__(accuracy)
+        self.problem = problem
+
+    def callback(self, timed_binding):
+        binding, time, event = timed_binding
+        if not event.get_id().endswith("<end_event>"):
+            return
+        if self.problem is not None:
+            time = self.problem.clock
+        self.record(case_of(binding[0][1].value), time)
+
+# the events after which a case has stopped waiting
+WAITING_EVENTS = ("<task:start>", "<intermediate_event>")
+
+class QueueStats:
+    """
+    A reporter that keeps statistics on the queues of a problem while it is
+    simulated, each updated for the places and events of every binding that
+    fired rather than by scanning the markings:
+
+    - for every place, the time-weighted mean and the max number of tokens
+      on it, e.g. cases in a queue;
+    - for every task and intermediate event, a sketch of the time cases 
+      waited for it, from becoming available until being taken, see 
+      `QuantileSketch`;
+    - for every resource pool, the time its resources were busy, from being
+      taken until becoming available again, i.e. its utilisation.
+
+    The statistics can be asked for at any time with `summary`, or written
+    out with `save`.
+
+    :param problem: the problem to keep statistics on, whose markings (and
+    clock) at the time are the start of the statistics. Its clock when a 
+    binding fired is the time of the changes, the binding may have been
+    enabled long before, e.g. after `warm_start` or `restore_state`.
+    """
+
+    def __init__(self, problem, accuracy=0.01):
+        self.problem = problem
+        self.start = problem.clock
+        self.time = problem.clock
+        self.accuracy = accuracy
+        # per place: [tokens, time of last change, area under the tokens, max]
+        self.lengths = {
+            place.get_id() : [len(place.marking), self.start, 0.0,
+                              len(place.marking)]
+            for place in problem.places
+        }
+        self.waits = dict()
+        # per pool: its size, the busy time of its resources so far, and
+        # when each of its resources was last taken
+        self.pools = {
+            place.get_id() : [len(place.marking), 0.0, dict()]
+            for place in problem.places
+            if getattr(place, "_resource_pool", False)
+        }
+
+    def _changed(self, place, time):
+        place = getattr(place, "simvar", place)
+        length = self.lengths.get(place.get_id())
+        if length is None:
+            return
+        tokens = len(place.marking)
+        length[2] += length[0] * (time - length[1])
+        length[0] = tokens
+        length[1] = time
+        if tokens > length[3]:
+            length[3] = tokens
+
+    def callback(self, timed_binding):
+        binding, _, event = timed_binding
+        time = self.time = self.problem.clock
+        for place in event.incoming:
+            self._changed(place, time)
+        for place in event.outgoing:
+            self._changed(place, time)
+        ev_id = event.get_id()
+        if ev_id.endswith(WAITING_EVENTS):
+            waits = self.waits.get(ev_id)
+            if waits is None:
+                waits = self.waits[ev_id] = QuantileSketch(self.accuracy)
+            waits.add(time - binding[0][1].time)
+        for place, token in binding:
+            pool = self.pools.get(place.get_id()) \
+                if getattr(place, "_resource_pool", False) else None
+            if pool is None:
+                continue
+            taken = pool[2]
+            # the resource was busy from being taken until it was available
+            if token.value in taken:
+                pool[1] += token.time - taken[token.value]
+            taken[token.value] = time
+
+    def mean_length(self, place, now=None):
+        """
+        Returns the time-weighted mean number of tokens on the place (by 
+        name) from the start until now, by default the last firing.
+        """
+        now = self.time if now is None else now
+        tokens, since, area, _ = self.lengths[place]
+        if now <= self.start:
+            return float(tokens)
+        return (area + tokens * (now - since)) / (now - self.start)
+
+    def utilisation(self, pool, problem=None, now=None):
+        """
+        Returns the fraction of the time that the resources of the pool (by
+        name) were busy from the start until now. Resources that have been 
+        taken are counted as busy until now, unless the problem is given to 
+        look up when those back in the pool became available.
+        """
+        now = self.time if now is None else now
+        size, busy, taken = self.pools[pool]
+        if size == 0 or now <= self.start:
+            return None
+        available = dict()
+        if problem is not None:
+            available = {
+                token.value : token.time
+                for token in problem.id2node[pool].marking
+            }
+        for resource, since in taken.items():
+            busy += max(0.0, min(available.get(resource, now), now) - since)
+        return busy / (size * (now - self.start))
+
+    def summary(self, problem=None, now=None):
+        """
+        Returns the statistics so far, as a mapping of places, waits and 
+        pools to a mapping of their names to their statistics.
+        """
+        now = self.time if now is None else now
+        result = { "start" : self.start, "time" : now }
+        result["places"] = {
+            name : {
+                "mean_length" : self.mean_length(name, now),
+                "max_length" : length[3],
+                "length" : length[0],
+            }
+            for name, length in self.lengths.items()
+        }
+        result["waits"] = {
+            ev_id.partition("<")[0] : {
+                "count" : waits.count,
+                "mean" : waits.mean(),
+                "p50" : waits.quantile(0.5),
+                "p90" : waits.quantile(0.9),
+                "p99" : waits.quantile(0.99),
+                "max" : waits.max,
+                "histogram" : waits.histogram(),
+            }
+            for ev_id, waits in self.waits.items()
+        }
+        result["pools"] = {
+            name : {
+                "size" : pool[0],
+                "utilisation" : self.utilisation(name, problem, now)
+            }
+            for name, pool in self.pools.items()
+        }
+        return result
+
+    def save(self, filename, problem=None, now=None):
+        """
+        Writes the `summary` to the file as JSON.
+        """
+        with open(filename, "w") as f:
+            json.dump(self.summary(problem, now), f, indent=2)
+
+def cases_in_progress(problem):
+    """
+    Returns the number of case tokens in the places of the problem, i.e. the
+    cases that have arrived but not yet reached an end event.
+    """
+    return sum(
+        1
+        for place in problem.places
+        for token in place.marking
+        if case_of(token.value) is not None
+    )
+
+# two-sided 95% critical values of the t distribution by degrees of freedom
+T_95 = [
+    None, 12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262,
+    2.228, 2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093,
+    2.086, 2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045,
+    2.042,
+]
+
+def confidence_interval(values):
+    """
+    Returns the mean of the values and the half-width of its 95% confidence
+    interval, using the t distribution for fewer than 30 degrees of freedom.
+    Values of None are left out, the half-width is None for a single value.
+    """
+    values = [ v for v in values if v is not None ]
+    if not values:
+        return None, None
+    n = len(values)
+    mean = sum(values) / n
+    if n < 2:
+        return mean, None
+    variance = sum((v - mean) ** 2 for v in values) / (n - 1)
+    t = T_95[n - 1] if n - 1 < len(T_95) else 1.960
+    return mean, t * sqrt(variance / n)
+
+def has_cases(problem):
+    """
+    Returns True if any place of the problem, other than a resource pool,
+    still holds a case token.
+    """
+    for place in problem.places:
+        if getattr(place, "_resource_pool", False):
+            continue
+        for token in place.marking:
+            if case_of(token.value) is not None:
+                return True
+    return False
@@ -0,0 +1,137 @@
+"""
+Records the frames of the visualiser to a GIF or video while it runs, rather
+than keeping every frame in memory until the window closes.
+
+    recorder = Recorder("output-000.gif", every=2, scale=0.5)
+    recorder.capture(pygame.display.get_surface())
+    ...
+    recorder.close()
+
+Frames are put on a bounded queue and encoded on a background thread, so
+memory stays at `queue_size` frames however long the recording runs, and a
+slow encoder only holds up the window once the queue is full. The format
+follows from the extension of the file. A .gif is written a frame at a time
+by `GifWriter`, as imageio keeps all the frames of a GIF until it is closed.
+Videos such as .mp4 are written by imageio, which needs the imageio-ffmpeg
+package for them.
+"""
+from queue import Queue
+from threading import Thread
+
+from PIL import Image, GifImagePlugin
+import imageio
+import numpy as np
+import pygame
+
+class GifWriter:
+    """
+    Writes an animated GIF a frame at a time, with pillow's helpers for 
+    writing GIFs in parts. Each frame after the first only holds the 
+    rectangle that changed, with its own palette of 256 colours.
+    """
+
+    def __init__(self, filename, fps=30):
+        self._file = open(filename, "wb")
+        self._duration = round(1000 / fps)
+        self._previous = None
+
+    def append_data(self, frame):
+        offset = (0, 0)
+        if self._previous is None:
+            image = Image.fromarray(np.ascontiguousarray(frame)).quantize(256)
+            header, _ = GifImagePlugin.getheader(image, info={"loop" : 0})
+            for part in header:
+                self._file.write(part)
+        else:
+            changed = np.any(frame != self._previous, axis=2)
+            rows = np.flatnonzero(changed.any(axis=1))
+            columns = np.flatnonzero(changed.any(axis=0))
+            if len(rows) == 0:
+                # a pixel, as the frame still takes its time
+                rows = columns = np.array([0])
+            offset = (int(columns[0]), int(rows[0]))
+            image = Image.fromarray(np.ascontiguousarray(
+                frame[rows[0]:rows[-1] + 1, columns[0]:columns[-1] + 1]
+            )).quantize(256)
+        self._previous = frame
+        for part in GifImagePlugin.getdata(image, offset,
+            duration=self._duration, disposal=1, include_color_table=True):
+            self._file.write(part)
+
+    def close(self):
+        self._file.write(b";")
+        self._file.close()
+
+class Recorder:
+    """
+    Encodes captured frames to the file on a background thread.
+
+    :param fps: the frames per second they are captured at.
+    :param every: capture only every k-th frame, the recording then plays
+    at fps / every so that it still runs at the speed of the window.
+    :param scale: the scale the frames are recorded at, e.g. 0.5 for half
+    the width and height of the window.
+    :param queue_size: the number of frames waiting to be encoded before
+    capturing waits for the encoder.
+    """
+
+    def __init__(self, filename, fps=30, every=1, scale=1.0, queue_size=32):
+        self.filename = filename
+        self.every = max(1, every)
+        self.scale = scale
+        self.frames = 0
+        self._captured = 0
+        self._error = None
+        if filename.lower().endswith(".gif"):
+            self._writer = GifWriter(filename, fps / self.every)
+        else:
+            self._writer = imageio.get_writer(
+                filename, mode="I", fps=fps / self.every
+            )
+        self._queue = Queue(maxsize=queue_size)
+        self._thread = Thread(target=self._encode, daemon=True)
+        self._thread.start()
+
+    def capture(self, surface):
+        """
+        Queues a copy of the surface to be encoded, unless the frame is
+        skipped by `every`.
+        """
+        self._captured += 1
+        if (self._captured - 1) % self.every:
+            return
+        if self._error is not None:
+            raise RuntimeError(f"could not record to {self.filename}: {self._error}")
+        if self.scale != 1.0:
+            surface = pygame.transform.smoothscale(surface, (
+                max(1, round(surface.get_width() * self.scale)),
+                max(1, round(surface.get_height() * self.scale))
+            ))
+        frame = pygame.surfarray.array3d(surface)
+        frame = frame.transpose([1, 0, 2])  # Convert to (height, width, channels)
+        self._queue.put(frame)
+        self.frames += 1
+
+    def _encode(self):
+        try:
+            while True:
+                frame = self._queue.get()
+                if frame is None:
+                    break
+                if self._error is None:
+                    try:
+                        self._writer.append_data(frame)
+                    except Exception as e:
+                        # the frames still queued are dropped
+                        self._error = e
+        finally:
+            self._writer.close()
+
+    def close(self):
+        """
+        Waits for the queued frames to be encoded and closes the file.
+        """
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise RuntimeError(f"could not record to {self.filename}: {self._error}")
@@ -0,0 +1,345 @@
+"""
+Saves a fully built SimProblem to disk and loads it back, so that a model
+only needs to be constructed once, e.g. before sending it to the workers of
+a replications run.
+
+    from snapshot import save_problem, load_problem
+    save_problem(problem, "model.snapshot")
+    problem = load_problem("model.snapshot")
+
+A snapshot is a pickle of the problem, its places and their markings, its
+events and its prototypes. The behaviours of events are often lambdas or
+functions defined in a script or inside a model factory, which the pickle
+module only stores by name when they can be imported again. Such functions
+are stored by value instead, as their (marshalled) code, closure and
+defaults, together with the name and file of the module their globals come
+from. On load, that module is looked up in sys.modules, imported, or loaded
+from its file, which runs the script again unless its simulation is behind
+`if __name__ == "__main__":`.
+
+As marshalled code is specific to a python version, snapshots can only be
+loaded by the same version of python that saved them.
+
+A checkpoint is a compressed snapshot of a running problem together with
+the state of the random module and any reporters, so that a simulation can
+be resumed where it left off and continue exactly as it would have.
+
+    save_checkpoint("run.checkpoint", problem, reporters=[kpis])
+    checkpoint = load_checkpoint("run.checkpoint")
+    problem = checkpoint["problem"]
+
+A state is the clock and the markings of a running problem by the names of
+its places, taken e.g. once a baseline run has reached a steady state. It
+can be loaded into another model, such as one with more agents or other
+branching probabilities, with the same names for its places, so that each
+what-if experiment starts from the steady state rather than from empty.
+
+    save_state("steady.state", baseline)
+    problem = build(agents=50)
+    warm_start(problem, load_state("steady.state"))
+
+States of only the places that changed are also how a problem simulated in
+another process is shown by the visualiser, see background.py.
+"""
+from importlib import import_module
+from importlib.util import spec_from_file_location, module_from_spec, find_spec
+from io import BytesIO
+from os import replace
+from types import FunctionType, CellType, ModuleType
+import marshal
+import pickle
+import random
+import sys
+import zlib
+
+from simpn.simulator import SimToken
+
+MAGIC = b"simpn-snapshot"
+
+_modules = dict()
+
+def _is_importable(func):
+    """
+    Returns True if the function can be found again by its module and
+    qualified name, in which case pickle stores it by reference.
+    """
+    module = sys.modules.get(func.__module__)
+    if module is None or func.__module__ == "__main__":
+        return False
+    try:
+        if find_spec(func.__module__) is None:
+            return False
+    except (ImportError, ValueError):
+        return False
+    obj = module
+    for part in func.__qualname__.split("."):
+        obj = getattr(obj, part, None)
+        if obj is None:
+            return False
+    return obj is func
+
+def _module_globals(name, filename):
+    """
+    Returns the globals of the module with the given name, loading it from
+    its file if it cannot be imported.
+    """
+    module = sys.modules.get(name)
+    if module is not None and getattr(module, "__file__", None) == filename:
+        return module.__dict__
+    if (name, filename) in _modules:
+        return _modules[(name, filename)].__dict__
+    if name != "__main__":
+        try:
+            module = import_module(name)
+            if filename is None or getattr(module, "__file__", None) == filename:
+                return module.__dict__
+        except ImportError:
+            pass
+    if filename is None:
+        raise pickle.UnpicklingError(
+            f"cannot find the module {name} for a function in the snapshot"
+        )
+    spec = spec_from_file_location(f"snapshot_{len(_modules)}", filename)
+    module = module_from_spec(spec)
+    spec.loader.exec_module(module)
+    _modules[(name, filename)] = module
+    return module.__dict__
+
+def _make_function(code, module, filename, name, cells):
+    """
+    Recreates an empty function, its closure and defaults are filled in by
+    `_fill_function` once they are unpickled.
+    """
+    closure = tuple(CellType() for _ in range(cells)) or None
+    return FunctionType(
+        marshal.loads(code), _module_globals(module, filename), name, None,
+        closure
+    )
+
+def _fill_function(func, state):
+    values, defaults, kwdefaults, qualname, attrs = state
+    for cell, value in zip(func.__closure__ or (), values):
+        cell.cell_contents = value
+    func.__defaults__ = defaults
+    func.__kwdefaults__ = kwdefaults
+    func.__qualname__ = qualname
+    func.__dict__.update(attrs)
+    return func
+
+def _module_by_name(name):
+    return import_module(name)
+
+class SnapshotPickler(pickle.Pickler):
+    """
+    A pickler that stores functions that cannot be imported by value.
+    """
+
+    def reducer_override(self, obj):
+        if isinstance(obj, ModuleType):
+            return _module_by_name, (obj.__name__,)
+        if type(obj) is not FunctionType or _is_importable(obj):
+            return NotImplemented
+        closure = obj.__closure__ or ()
+        state = (
+            [ cell.cell_contents for cell in closure ],
+            obj.__defaults__,
+            obj.__kwdefaults__,
+            obj.__qualname__,
+            obj.__dict__,
+        )
+        return (
+            _make_function,
+            (
+                marshal.dumps(obj.__code__),
+                obj.__module__,
+                obj.__globals__.get("__file__"),
+                obj.__name__,
+                len(closure),
+            ),
+            state,
+            None,
+            None,
+            _fill_function,
+        )
+
+def dumps(problem):
+    """
+    Returns the snapshot of the problem (or any object holding problems) as
+    bytes.
+    """
+    buffer = BytesIO()
+    buffer.write(MAGIC)
+    buffer.write(sys.version.encode() + b"\n")
+    SnapshotPickler(buffer, protocol=pickle.HIGHEST_PROTOCOL).dump(problem)
+    return buffer.getvalue()
+
+def loads(data):
+    """
+    Returns the problem in a snapshot made by `dumps`.
+    """
+    if not data.startswith(MAGIC):
+        raise ValueError("not a snapshot of a problem")
+    version, _, data = data[len(MAGIC):].partition(b"\n")
+    if version.decode() != sys.version:
+        raise ValueError(
+            f"snapshot was made by python {version.decode()}, "
+            f"not {sys.version}"
+        )
+    return pickle.loads(data)
+
+def save_problem(problem, filename):
+    """
+    Writes a snapshot of the problem to the file.
+    """
+    with open(filename, "wb") as f:
+        f.write(dumps(problem))
+
+def load_problem(filename):
+    """
+    Reads the problem from a snapshot file written by `save_problem`.
+    """
+    with open(filename, "rb") as f:
+        return loads(f.read())
+
+def save_checkpoint(filename, problem, reporters=None, **extra):
+    """
+    Writes a checkpoint of the problem, the state of the random module and
+    the given reporters to the file. Any extra keyword arguments are stored
+    with it. The file is replaced in one go, so an interrupted save leaves
+    the previous checkpoint intact.
+    """
+    checkpoint = {
+        "problem" : problem,
+        "random" : random.getstate(),
+        "reporters" : reporters,
+        **extra
+    }
+    data = zlib.compress(dumps(checkpoint), 6)
+    with open(filename + ".tmp", "wb") as f:
+        f.write(data)
+    replace(filename + ".tmp", filename)
+
+def load_checkpoint(filename):
+    """
+    Reads a checkpoint written by `save_checkpoint`, restoring the state of
+    the random module. Returns the checkpoint as a mapping with the problem,
+    the reporters and any extras.
+    """
+    with open(filename, "rb") as f:
+        checkpoint = loads(zlib.decompress(f.read()))
+    random.setstate(checkpoint["random"])
+    return checkpoint
+
+def capture_state(problem, places=None):
+    """
+    Returns the clock of the problem and a copy of the tokens on each of its
+    places, by the name of the place.
+
+    :param places: the names of the places to copy the tokens of, by
+    default all of them.
+    """
+    return {
+        "clock" : problem.clock,
+        "marking" : {
+            place.get_id() : [ token.copy() for token in place.marking ]
+            for place in problem.places
+            if places is None or place.get_id() in places
+        }
+    }
+
+def save_state(filename, problem):
+    """
+    Writes the state of the problem to the file, see `capture_state`.
+    """
+    with open(filename, "wb") as f:
+        f.write(zlib.compress(dumps(capture_state(problem)), 6))
+
+def load_state(filename):
+    """
+    Reads a state written by `save_state`.
+    """
+    with open(filename, "rb") as f:
+        return loads(zlib.decompress(f.read()))
+
+def restore_state(problem, state):
+    """
+    Replaces the markings of the places in the state, see `capture_state`,
+    and moves the clock of the problem to the clock of the state. Unlike
+    `warm_start`, the state is taken to come from the same model, e.g. from 
+    a copy of the problem simulated in another process, so its tokens are 
+    used as they are.
+    """
+    marking = state["marking"]
+    for place in problem.places:
+        tokens = marking.get(place.get_id())
+        if tokens is None:
+            continue
+        place.marking.clear()
+        for token in tokens:
+            place.add_token(token)
+    problem.clock = state["clock"]
+    if hasattr(problem, "invalidate_bindings"):
+        problem.invalidate_bindings()
+
+def _resources_in(value, resources):
+    """
+    Yields the resources of a pool held in a token value, which is either 
+    the resource itself or a tuple holding it, e.g. (case, resource).
+    """
+    try:
+        if value in resources:
+            yield value
+            return
+    except TypeError:
+        return
+    if isinstance(value, tuple):
+        for part in value:
+            yield from _resources_in(part, resources)
+
+def warm_start(problem, state):
+    """
+    Replaces the markings of the places in the problem with those of the 
+    same name in the state, see `capture_state`, and moves its clock to the
+    clock of the state. Places without a match in the state keep their
+    marking. Busy tasks come along with their places, e.g. the busy place of
+    a task of the same name.
+
+    Resource pools are resized to the pool of the problem: resources it has 
+    that are neither idle nor busy in the state are added as idle, and idle
+    resources that it does not have are left out. Resources it does not
+    have that are busy in the state return to the pool once they are done.
+
+    :returns: the names of the places in the state that are not in the
+    problem, whose tokens were left out.
+    """
+    marking = state["marking"]
+    resources = set()
+    for place in problem.places:
+        if getattr(place, "_resource_pool", False) \
+            and place.get_id() in marking:
+            resources.update(token.value for token in place.marking)
+    held = set()
+    if resources:
+        for tokens in marking.values():
+            for token in tokens:
+                held.update(_resources_in(token.value, resources))
+    clock = state["clock"]
+    for place in problem.places:
+        name = place.get_id()
+        if name not in marking:
+            continue
+        tokens = marking[name]
+        if getattr(place, "_resource_pool", False):
+            pool = set(token.value for token in place.marking)
+            tokens = [ token for token in tokens if token.value in pool ] + [
+                SimToken(token.value, clock) 
+                for token in place.marking if token.value not in held
+            ]
+        place.marking.clear()
+        for token in tokens:
+            place.add_token(token.copy())
+    problem.clock = clock
+    if hasattr(problem, "invalidate_bindings"):
+        problem.invalidate_bindings()
+    names = set(place.get_id() for place in problem.places)
+    return [ name for name in marking if name not in names ]
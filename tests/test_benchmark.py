@@ -0,0 +1,56 @@
+"""
+Checks how benchmark results are compared to the baseline.
+"""
+from os.path import dirname, abspath
+import sys
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from benchmark import compare
+
+def results(steps=1000, steps_per_sec=5000.0, events_per_sec=2000.0,
+            peak_rss_kb=100000, machine="machine"):
+    return {
+        "machine" : machine,
+        "results" : {
+            "tut-bpmn-01" : {
+                "steps" : steps,
+                "steps_per_sec" : steps_per_sec,
+                "events_per_sec" : events_per_sec,
+                "peak_rss_kb" : peak_rss_kb,
+            }
+        }
+    }
+
+def test_same_results_are_neither_changed_nor_regressed():
+    assert compare(results(), results()) == ([], [])
+
+def test_different_number_of_steps_is_a_change():
+    regressions, changes = compare(results(steps=1001), results())
+    assert regressions == []
+    assert len(changes) == 1
+    assert "1001 steps" in changes[0]
+
+def test_throughput_drop_beyond_tolerance_is_a_regression():
+    regressions, changes = compare(
+        results(steps_per_sec=4000.0), results(), tolerance=0.1
+    )
+    assert changes == []
+    assert len(regressions) == 1
+    assert "steps_per_sec" in regressions[0]
+
+def test_throughput_drop_within_tolerance_is_not_a_regression():
+    regressions, _ = compare(
+        results(steps_per_sec=4600.0), results(), tolerance=0.1
+    )
+    assert regressions == []
+
+def test_memory_growth_beyond_tolerance_is_a_regression():
+    regressions, _ = compare(results(peak_rss_kb=150000), results())
+    assert len(regressions) == 1
+    assert "peak_rss_kb" in regressions[0]
+
+def test_baseline_from_another_machine_is_a_change():
+    _, changes = compare(results(), results(machine="other"))
+    assert len(changes) == 1
+    assert "another machine" in changes[0]
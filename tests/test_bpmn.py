@@ -0,0 +1,29 @@
+"""
+Checks the arrivals generated by start events.
+"""
+from os.path import dirname, abspath
+import sys
+
+import pytest
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from bpmn import HelperBPMNStart
+from util import ParallelSimProblem
+
+@pytest.mark.parametrize("amount, window, limit, firings", [
+    (2, 1, 4, [0, 1]),
+    (2, 1, 5, [0, 1, 2]),
+    (2, 3, 4, [0]),
+    (1, 1, 3, [0, 1, 2]),
+])
+def test_start_event_stops_at_the_limit(amount, window, limit, firings):
+    problem = ParallelSimProblem()
+    arrived = problem.add_var("arrived")
+    HelperBPMNStart(problem, [], [arrived], "arrive", lambda: 1,
+                    amount=amount, window=window, limit=limit)
+    fired = []
+    while problem.step() is not None:
+        fired.append(problem.clock)
+    assert fired == firings
+    assert len(arrived.marking) == limit
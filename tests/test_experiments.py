@@ -0,0 +1,30 @@
+"""
+Runs the experiments CLI against the tutorial models, which take different
+parameters.
+"""
+from os.path import dirname, abspath
+import subprocess
+import sys
+
+import pytest
+
+ROOT = dirname(dirname(abspath(__file__)))
+
+def experiment(*args):
+    return subprocess.run(
+        [sys.executable, "experiments.py", *args],
+        cwd=ROOT, capture_output=True, text=True, timeout=600
+    )
+
+@pytest.mark.parametrize("model", ["tut-bpmn-01.py", "tut-bpmn-02.py"])
+def test_cli_runs_model(model):
+    result = experiment(f"{model}:build", "-n", "2", "-d", "5", "-w", "1",
+                        "--agents", "5")
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.startswith("agents=5")
+
+def test_cli_rejects_varying_a_parameter_the_model_does_not_take():
+    result = experiment("tut-bpmn-02.py:build", "-n", "1", "-d", "5",
+                        "-w", "1", "--batched", "1", "2")
+    assert result.returncode != 0
+    assert "no parameter batched" in result.stderr
@@ -0,0 +1,20 @@
+"""
+Runs the headless CLI against the tutorial models.
+"""
+from os.path import dirname, abspath
+import subprocess
+import sys
+
+ROOT = dirname(dirname(abspath(__file__)))
+
+def headless(*args):
+    return subprocess.run(
+        [sys.executable, "headless.py", *args],
+        cwd=ROOT, capture_output=True, text=True, timeout=600
+    )
+
+def test_cli_rejects_a_parameter_the_model_does_not_take():
+    result = headless("tut-bpmn-02.py:build", "-d", "1", "--batched", "2")
+    assert result.returncode == 2
+    assert "takes no parameter batched" in result.stderr
+    assert "Traceback" not in result.stderr
@@ -0,0 +1,44 @@
+"""
+Checks that caching the enabled bindings of each event between steps takes
+the same steps as enumerating all of them on every step.
+"""
+from os.path import dirname, abspath, join
+import random
+import sys
+
+import pytest
+
+ROOT = dirname(dirname(abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from experiments import load_factory
+
+def trace(model, steps, incremental):
+    random.seed(42)
+    problem = load_factory(join(ROOT, f"{model}:build"))(agents=25)
+    problem._incremental = incremental
+    problem.variates.seed(42)
+    result = []
+    for _ in range(steps):
+        timed_binding = problem.step()
+        if timed_binding is None:
+            break
+        binding, time, event = timed_binding
+        result.append((
+            event.get_id(), time, problem.clock,
+            [ (place.get_id(), str(token)) for place, token in binding ]
+        ))
+    return result
+
+@pytest.mark.parametrize("model, steps", [
+    ("tut-bpmn-01.py", 1200),
+    ("tut-bpmn-02.py", 1200),
+    ("tut-bpmn-03.py", 300),
+    ("tut-bpmn-04.py", 300),
+    ("tut-bpmn-05.py", 300),
+    ("tut-bpmn-master.py", 1200),
+])
+def test_incremental_takes_the_same_steps(model, steps):
+    expected = trace(model, steps, incremental=False)
+    assert len(expected) == steps
+    assert trace(model, steps, incremental=True) == expected
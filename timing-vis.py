@@ -8,7 +8,7 @@ FILE = None
 WINDOW = 1
 
 if len(argv) < 2:
-    raise ValueError("Missing datasum file for tracking")
+    raise ValueError("Missing datasum or timings csv file for tracking")
 FILE = argv[1]    
 
 finders = {
@@ -17,12 +17,18 @@ finders = {
     'firing took ' : []
 }
 
-for line in open(FILE, "r").readlines():
-    for finds in finders.keys():
-        if finds in line:
-            grabber = re.compile(f"{finds}([0-9\\.]*)s")
-            for time in grabber.findall(line):
-                finders[finds].append(float(time) * 1000)
+if FILE.endswith(".csv"):
+    # written by a metrics.TimingCollector sink
+    from metrics import read_timings
+    for phase, times in read_timings(FILE).items():
+        finders[f"{phase} took "] = [ time * 1000 for time in times ]
+else:
+    for line in open(FILE, "r").readlines():
+        for finds in finders.keys():
+            if finds in line:
+                grabber = re.compile(f"{finds}([0-9\\.]*)s")
+                for time in grabber.findall(line):
+                    finders[finds].append(float(time) * 1000)
 
 def mean(data, window):
         return sum(data) / window
@@ -8,35 +8,34 @@ from bpmn import BPMN
 from util import PriorityScheduler, pick_time, increment_priority
 from util import ParallelSimProblem as SimProblem
 
-from random import uniform, choice as random_choice
+from random import choice as random_choice
 from os.path import join 
 from sys import argv
 from time import time
 
+from simsettings import DURATION, BACKLOG, AGENTS, BATCHED, RATE
+
 TESTING = False
 RECORD = False
 T_DURATION = 8
 
-def work():
-
-    LAYOUT_FILE = join(".", "tut-bpmn-02.layout")
+LAYOUT_FILE = join(".", "tut-bpmn-02.layout")
 
+def build(agents=AGENTS):
+    """
+    Builds the model of this tutorial with the given number of agents in 
+    the dhs pool.
+    """
     shop = SimProblem(
         binding_priority=PriorityScheduler("Notice Issued")
     )
-
-    from simsettings import DURATION, BACKLOG, AGENTS, BATCHED, RATE
-
-    if (len(argv) < 2):
-        print("missing argument for number of agents, using default of 25.")
-    else:
-        AGENTS = int(argv[1])
+    stream = shop.variates.stream
 
     class DHS(BPMN):
         type="resource-pool"
         model=shop
         name="dhs"
-        amount=AGENTS
+        amount=agents
 
     c1 = shop.add_var("exclusive-choice-1")
     r1 = shop.add_var("recipient initially responds")
@@ -74,10 +73,10 @@ def work():
         name = "Does the recipient respond?"
 
         def choice(c):
-            pick = uniform(1, 100)
+            pick = stream("Does the recipient respond?").uniform(1, 100)
             c = increment_priority(c)
             if pick <= 20:
-                return [SimToken(c, delay=pick_time(7 * 8, 2 * 8)), None]
+                return [SimToken(c, delay=pick_time(7 * 8, 2 * 8, stream=stream("Does the recipient respond?"))), None]
             else:
                 return [None, SimToken(c, delay=21 * 8)]
             
@@ -101,7 +100,7 @@ def work():
 
         def behaviour(c, r):
             c = increment_priority(c)
-            return [SimToken((c,r), delay=pick_time(2))]
+            return [SimToken((c,r), delay=pick_time(2, stream=stream("Check for active payments")))]
 
     class RecipientCalls(BPMN):
         type="event"
@@ -112,7 +111,7 @@ def work():
 
         def behaviour(c , r):
             c = increment_priority(c)
-            call_time = pick_time(2)
+            call_time = pick_time(2, stream=stream("Recipient calls DHS"))
             return [
                 SimToken(c, delay=call_time), 
                 SimToken(r, delay=call_time)
@@ -126,7 +125,7 @@ def work():
         name = "does recipient have active payments?"
 
         def choice(c):
-            pick = uniform(1, 100)
+            pick = stream("does recipient have active payments?").uniform(1, 100)
             c = increment_priority(c)
             if pick <= 20:
                 return [SimToken(c), None]
@@ -142,7 +141,7 @@ def work():
 
         def behaviour(c, r):
             c = increment_priority(c)
-            return [SimToken((c,r), delay=pick_time(2))]
+            return [SimToken((c,r), delay=pick_time(2, stream=stream("Suspend payments and hold review")))]
         
     class DoesRecipientRespond2(BPMN):
         type="gat-ex-split"
@@ -152,12 +151,12 @@ def work():
         name = "Does the recipient respond"
 
         def choice(c):
-            pick = uniform(1, 100)
+            pick = stream("Does the recipient respond").uniform(1, 100)
             c = increment_priority(c)
             if pick <= 20:
                 return [SimToken(c, delay=14*8), None]
             else:
-                return [None, SimToken(c, pick_time(7*8, 2*8))]
+                return [None, SimToken(c, pick_time(7*8, 2*8, stream=stream("Does the recipient respond")))]
             
     class Waiting14Days(BPMN):
         type="event"
@@ -179,7 +178,7 @@ def work():
 
         def behaviour(c, r):
             c = increment_priority(c)
-            call_time = pick_time(2)
+            call_time = pick_time(2, stream=stream("Recipient Calls In"))
             return [
                 SimToken(c, delay=call_time), 
                 SimToken(r, delay=call_time)
@@ -194,7 +193,7 @@ def work():
 
         def behaviour(c, r):
             c = increment_priority(c)
-            return [SimToken((c,r), delay=pick_time(2))]
+            return [SimToken((c,r), delay=pick_time(2, stream=stream("Restore payments")))]
         
     class ExclusiveJoin2(BPMN):
         type="gat-ex-join"
@@ -222,6 +221,16 @@ def work():
         incoming = [nonrespond]
         name = "Recipient did not responded"
 
+    return shop
+
+if __name__ == "__main__":
+    if (len(argv) < 2):
+        print("missing argument for number of agents, using default of 25.")
+    else:
+        AGENTS = int(argv[1])
+
+    shop = build(AGENTS)
+
     if TESTING:
         start = time()
         shop.simulate(T_DURATION)
@@ -243,6 +252,3 @@ def work():
         vis.set_speed(2000)
         vis.show()
         vis.save_layout(LAYOUT_FILE)
-
-if __name__ == "__main__":
-    work()
\ No newline at end of file
@@ -1,120 +1,593 @@
-from simpn.simulator import SimProblem, SimToken
+from simpn.simulator import SimProblem, SimToken, SimVarTime
+from sortedcontainers import SortedKeyList
 
-from joblib import Parallel, delayed 
 from tqdm import tqdm
 
-from random import choice as random_choice, normalvariate
-from itertools import batched, product
-from time import time as now
+from random import choice as random_choice, normalvariate, expovariate
+from itertools import batched, product, islice, repeat, count, accumulate
+from heapq import merge, heappush, heappop
+from bisect import bisect_right
+from collections.abc import Sequence
+from time import perf_counter as now
+from typing import NamedTuple
 from copy import deepcopy
 
-def pick_time(normally, dev=None) -> float:
+from variates import Variates
+
+def pick_time(normally, dev=None, stream=None) -> float:
     """
     Returns a a non-neg normally distribution sample from a 
     distribution with a mean of `normally` with a deviation 
     of `dev`. `dev` defaults to 1/4 of `normally` if not given.
     Minimum return value is 1/8 of the normally time.
+    The sample is drawn from the given `variates.VariateStream`,
+    or from the random module without one.
     """
     if dev is None:
         dev = max(0.25, normally * 0.25)
     return max(
         (normally * (1/8.0)),
-        normalvariate(normally, dev)
+        normalvariate(normally, dev) if stream is None 
+        else stream.normal(normally, dev)
     )
 
-def increment_priority(tok_values):
+def poisson_interarrival(rate, stream=None):
+    """
+    Returns an interarrival_time function for a Poisson arrival process, 
+    i.e. exponentially distributed gaps with a mean of `rate`, drawn from
+    the given `variates.VariateStream` or the random module without one.
+    """
+    if stream is not None:
+        return lambda: stream.exponential(rate)
+    return lambda: expovariate(1.0 / rate)
+
+def scheduled_interarrival(filename):
+    """
+    Returns an interarrival_time function that follows the arrival times 
+    listed in the given file, one per line. Times are relative to the first
+    line, which is the arrival at the start of the simulation. The function
+    returns None once the schedule runs out, which stops the arrivals.
+    """
+    with open(filename, "r") as f:
+        times = [
+            float(line) for line in (line.strip() for line in f)
+            if line and not line.startswith("#")
+        ]
+    gaps = iter([ later - earlier for earlier, later in zip(times, times[1:]) ])
+    return lambda: next(gaps, None)
+
+def next_maturity(marking, clock):
+    """
+    Returns the time of the earliest token in the marking that is not yet
+    available at the given clock, or None if all tokens are available.
+    """
+    try:
+        idx = marking.bisect_key_right(clock)
+    except AttributeError:
+        later = [ tok.time for tok in marking if tok.time > clock ]
+        return min(later) if later else None
+    return marking[idx].time if idx < len(marking) else None
+
+class Case(NamedTuple):
     """
-    Increments the values of a token so the scheduler prioritise it more.
+    The value of a case token, as generated by a start event.
+
+    `id` is the number of the case at its start event, `priority` counts the
+    actions taken on the case so far (see `increment_priority`) and `origin`
+    is the name of the start event that generated it, at the clock time
+    `arrival`.
     """
-    if len(tok_values) > 1:
-        tok_values = (tok_values[0], tok_values[1]+1)
-    else:
-        tok_values = (tok_values[0], 1)
-    return tok_values
+    id: int
+    priority: int = 0
+    origin: str = None
+    arrival: float = None
+
+    def __str__(self):
+        return f"{self.origin}-{self.id}"
+
+def increment_priority(case:Case) -> Case:
+    """
+    Increments the priority of a case so the scheduler prioritise it more.
+    """
+    return Case(case.id, case.priority + 1, case.origin, case.arrival)
 
 class PriorityScheduler:
+    """
+    Selects the binding whose case has been worked on the most, i.e. has the
+    highest `Case.priority`, for cases started by the given start event. 
+    Ties are broken at random.
+
+    Selection is a single pass over the bindings that keeps the bucket of 
+    bindings with the highest priority seen so far, rather than scoring,
+    sorting and scanning all of them. As the priority is its `key`, a 
+    `ParallelSimProblem` hands over only the bindings with the highest 
+    priority, which are then chosen from without a pass.
+    """
     
     def __init__(self, start_name, debug=False):
         self._start_name = start_name 
-        self.pool = Parallel(n_jobs=-2)
         self._debug = debug
 
     def log(self, msg):
         if (self._debug):
             print(f"PriorityScheduler::{msg}")
 
+    def count_actions(self, choice):
+        """
+        Returns the priority of the case in the given token, or 0 if the token
+        does not carry a case from the start event. The case is either the
+        value of the token or the first element of a tuple value, e.g. the
+        (case, resource) tokens of a busy task.
+        """
+        case = choice.value
+        if type(case) is not Case:
+            if type(case) is not tuple or not case or type(case[0]) is not Case:
+                return 0
+            case = case[0]
+        if case.origin != self._start_name:
+            return 0
+        return case.priority
+
+    def key(self, token):
+        """
+        Returns the priority of a binding by the token on its first incoming
+        place, see `count_actions`. Only the bindings with the highest key
+        can be selected, see `ParallelSimProblem`.
+        """
+        return self.count_actions(token)
+
     def __call__(self, bindings, *args, **kwds):
 
-        if (len(bindings) < 2):
-            # self.log("Short scheduling...")
+        # the bindings may be only those with the highest key, out of the
+        # number enabled
+        if (getattr(bindings, "enabled", len(bindings)) < 2):
             return bindings[0]
 
         self.log("Scheduling...")
-        def count_actions(choice, name=self._start_name):
-            actions = 0
-            if isinstance(choice, SimToken):
-                if isinstance(choice.value, tuple) and len(choice.value) > 1:
-
-                    nested_values = False
-                    for vals in choice.value:
-                        nested_values = nested_values or isinstance(vals, tuple)
-                        if nested_values:
-                            break
-
-                    if nested_values:
-                        for vals in choice.value:
-                            if not isinstance(vals, tuple):
-                                continue
-                            if name in vals[0]:
-                                actions += vals[1]
-                    else:
-                        if name in choice.value[0]:
-                            actions += choice.value[1]
-            return actions
-        
-        def counter(bind):
-            actions = 0
-            for choice in bind[0][0]:
-                actions += count_actions(choice)
-            return actions
-
-        def grabber(bind):
-            return (counter(bind),bind)
-        
-        # if (len(bindings) > 100):
-        #     queue = self.pool(
-        #         delayed(grabber)(bind) for bind in bindings
-        #     )
-        # else:
-        queue = [
-            grabber(bind) for bind in bindings
-        ]
-        
-        self.log("sorting...")
-        queue = sorted(queue, key=lambda x: x[0], reverse=True)
-        top_action = queue[0][0]
-        self.log(f"selection for {top_action}...")
-        top_choices = [ ]
-        if top_action == 0:
+        top_action = getattr(bindings, "top_key", None)
+        if top_action is not None:
             top_choices = bindings
         else:
-            for (count, choice) in queue:
-                if count < top_action:
-                    break
-                top_choices.append(choice)
+            # the case is the token on the first incoming place
+            top_action = 0
+            top_choices = bindings
+            for bind in bindings:
+                actions = self.count_actions(bind[0][0][1])
+                if actions > top_action:
+                    top_action = actions
+                    top_choices = [bind]
+                elif actions == top_action and actions > 0:
+                    top_choices.append(bind)
+        self.log(f"selection for {top_action}...")
         selected = random_choice(top_choices)
         self.log(f"selected one from {len(top_choices)}...")
         return selected
     
+class EnabledBindings(Sequence):
+    """
+    The timed bindings enabled in a problem, in the order of its events, 
+    as a sequence over the bindings of each event rather than one list of
+    all of them. A binding is only made when it is looked up.
+
+    :param parts: a list of (items, make) for each event with bindings, 
+    where items is a sequence and make turns one of its items into a timed
+    binding.
+    :param top_key: if given, the bindings are only those with the highest
+    key of the binding priority, which is this one, see `ParallelSimProblem`.
+    :param enabled: the number of bindings enabled, of which these are the
+    ones with the highest key, by default as many as there are.
+    """
+
+    def __init__(self, parts, top_key=None, enabled=None):
+        self._parts = parts
+        self._ends = list(accumulate(len(items) for items, _ in parts))
+        self.top_key = top_key
+        self.enabled = len(self) if enabled is None else enabled
+
+    def __len__(self):
+        return self._ends[-1] if self._ends else 0
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("binding index out of range")
+        part = bisect_right(self._ends, index)
+        items, make = self._parts[part]
+        return make(items[index - (self._ends[part - 1] if part else 0)])
+
+    def __iter__(self):
+        for items, make in self._parts:
+            for item in items:
+                yield make(item)
+
+class _Prefix(Sequence):
+    """
+    The first `length` tokens of a marking, e.g. those available at the 
+    clock, without copying them.
+    """
+
+    def __init__(self, marking, length):
+        self._marking = marking
+        self._length = length
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("token index out of range")
+        return self._marking[index]
+
+    def __iter__(self):
+        return self._marking.islice(0, self._length)
+
+class _KeyedTokens:
+    """
+    The tokens on a place that are available at the clock, by their key,
+    each in the order of the marking. As the marking is ordered by time, 
+    the available tokens are a prefix of it, which only grows at its end 
+    as the clock advances or tokens are added at the clock. So `update` 
+    only looks at the tokens after the `count` already kept, and tokens 
+    taken by a firing are dropped with `remove`.
+    """
+
+    def __init__(self, place, key):
+        self.place = place
+        self.key = key
+        self.count = 0
+        self.buckets = dict()
+
+    def update(self, clock):
+        marking = self.place.marking
+        ready = marking.bisect_key_right(clock)
+        for token in marking.islice(self.count, ready):
+            key = self.key(token)
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = SortedKeyList(key=marking.key)
+            bucket.add(token)
+        self.count = max(self.count, ready)
+
+    def remove(self, token):
+        key = self.key(token)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            return
+        size = len(bucket)
+        bucket.discard(token)
+        if len(bucket) < size:
+            self.count -= 1
+            if not bucket:
+                del self.buckets[key]
+
 class ParallelSimProblem(SimProblem):
     """
     An attempt to speed up steps by taking advantage of the inherent
     parallism needed to process tasks
     """
 
-    def __init__(self, debugging=True, binding_priority=lambda bindings: bindings[0]):
+    def __init__(self, debugging=True, binding_priority=lambda bindings: bindings[0],
+                 incremental=True, timings=None, variates=None):
+        """
+        :param incremental: if set to True (default), the enabling bindings
+        of each event are cached and only recomputed for events that consume
+        from a place touched by the last firing. Otherwise all bindings are
+        enumerated again on every step, see `iter_event_bindings`, which 
+        gives the same steps.
+        :param binding_priority: selects the binding to fire from the 
+        enabled ones. If it has a `key`, a function of the token on the 
+        first incoming place of a binding, it must select one of the 
+        bindings with the highest key, e.g. `PriorityScheduler`. It is then
+        only handed those, as `EnabledBindings` with their `top_key`, and 
+        queue events keep the available tokens of their queue by key, so 
+        that no step looks at all bindings of a long queue.
+        :param timings: an optional `metrics.TimingCollector` that records
+        how long each phase of a step took, steps are not timed without one.
+        :param variates: the `variates.Variates` to draw durations and 
+        choices from, by default one seeded from the random module.
+        """
         super().__init__(debugging, binding_priority)
-        
+        self.timings = timings
+        self.variates = Variates() if variates is None else variates
+        self._incremental = incremental
+        self._key = None
+        self._keyed = dict()
+        self._binding_cache = dict()
+        self._dirty_events = set()
+        self._place_events = dict()
+        self._volatile_events = set()
+        self._queue_events = dict()
+        self._indexed_events = 0
+        # future event list: (time, seq, place) for the next token on a 
+        # place that is not yet available, entries not matching the time 
+        # scheduled for their place are stale
+        self._future = []
+        self._future_seq = count()
+        self._scheduled = dict()
+
+    def _index_events(self):
+        """
+        Rebuilds the mapping from places to the events that consume from 
+        them, the future event list and drops all cached bindings. Events
+        that read the time variable are volatile, as their bindings change
+        with the clock. Events without a guard that take a token from one 
+        place and the first tokens of resource pools are queue events, see
+        `_queue_bindings`.
+        """
+        self._place_events = dict()
+        self._volatile_events = set()
+        self._queue_events = dict()
+        self._key = getattr(self.binding_priority, "key", None)
+        self._keyed = dict()
+        for ev in self.events:
+            for place in ev.incoming:
+                if isinstance(place, SimVarTime):
+                    self._volatile_events.add(ev)
+                # queues are views over the marking of another place
+                place = getattr(place, 'simvar', place)
+                self._place_events.setdefault(place, []).append(ev)
+            queues = [
+                i for i, place in enumerate(ev.incoming)
+                if not getattr(place, '_resource_pool', False)
+            ]
+            if ev.guard is None and ev not in self._volatile_events \
+                and len(queues) == 1 \
+                and not hasattr(ev.incoming[queues[0]], 'simvar') \
+                and hasattr(ev.incoming[queues[0]].marking, 'bisect_key_right') \
+                and len(set(ev.incoming)) == len(ev.incoming):
+                self._queue_events[ev] = queues[0]
+        self._binding_cache = dict()
+        self._dirty_events = set(self.events)
+        self._future = []
+        self._scheduled = dict()
+        for place in self.places:
+            self._schedule(place)
+        self._indexed_events = len(self.events)
+
+    def _schedule(self, place):
+        """
+        Adds the next token on the place that is not yet available at the 
+        current clock to the future event list.
+        """
+        maturity = next_maturity(place.marking, self.clock)
+        if maturity is None:
+            return
+        scheduled = self._scheduled.get(place)
+        if scheduled is None or maturity < scheduled:
+            self._scheduled[place] = maturity
+            heappush(self._future, (maturity, next(self._future_seq), place))
+
+    def _advance_clock(self):
+        """
+        Moves the clock to the time the next token becomes available and 
+        marks the events consuming from the places of all tokens becoming
+        available at that time. Returns False if no token is pending.
+        """
+        future = self._future
+        advanced = False
+        while future:
+            time, _, place = future[0]
+            if advanced and time > self.clock:
+                break
+            heappop(future)
+            if self._scheduled.get(place) != time:
+                continue
+            del self._scheduled[place]
+            if not advanced:
+                maturity = next_maturity(place.marking, self.clock)
+                if maturity is None:
+                    continue
+                if maturity > time:
+                    # the token it was for has been consumed in the meantime
+                    self._schedule(place)
+                    continue
+                self.clock = maturity
+                advanced = True
+            self._dirty_events.update(self._place_events.get(place, ()))
+            self._schedule(place)
+        return advanced
+
+    def invalidate_bindings(self, places=None):
+        """
+        Drops the cached bindings of the events that consume from the given 
+        places, or all cached bindings if no places are given.
+        Call this after changing a marking outside of `fire`, e.g. with 
+        `place.put`, once the simulation has started.
+        """
+        if places is None:
+            self._index_events()
+            return
+        for place in places:
+            self._keyed.pop(getattr(place, 'simvar', place), None)
+        self._changed(places)
+
+    def _changed(self, places):
+        """
+        Marks the events that consume from the given places as dirty and
+        schedules the next token on each of them.
+        """
+        for place in places:
+            place = getattr(place, 'simvar', place)
+            self._dirty_events.update(self._place_events.get(place, ()))
+            self._schedule(place)
+
+    def cached_event_bindings(self, event):
+        """
+        Returns the bindings of the given event that are enabled at the 
+        current clock, see `iter_event_bindings`, reusing the previous 
+        result if none of the event's incoming places have changed and no
+        token on them has become available since.
+        """
+        part = self._event_part(event)
+        if part is None:
+            return []
+        items, make = part[:2]
+        return [ make(item)[:2] for item in items ]
+
+    def _event_part(self, event):
+        """
+        Returns the cached bindings of the event as a part of 
+        `EnabledBindings` followed by the highest key of the binding 
+        priority and the items with it (both None without a key), or None
+        if it has none, after recomputing them if the event is dirty or 
+        volatile.
+        """
+        if not self._incremental or event in self._dirty_events \
+            or event in self._volatile_events:
+            if event in self._queue_events:
+                part = self._queue_bindings(event, self._queue_events[event])
+            else:
+                part = self._ready_event_bindings(event)
+            if part is not None:
+                self._binding_cache[event] = part
+            else:
+                self._binding_cache.pop(event, None)
+            self._dirty_events.discard(event)
+            return part
+        return self._binding_cache.get(event)
+
+    def _ready_event_bindings(self, event):
+        """
+        Returns the bindings of the event enabled at the current clock as a
+        part of `EnabledBindings`, see `_event_part`, or None if there are 
+        none. All of them are enumerated, see `iter_event_bindings`.
+        """
+        bindings = list(self.iter_event_bindings(event, until=self.clock))
+        if not bindings:
+            return None
+        make = lambda item: (item[0], item[1], event)
+        if self._key is None:
+            return bindings, make, None, None
+        keys = [ self._key(binding[0][1]) for binding, _ in bindings ]
+        top = max(keys)
+        return bindings, make, top, [
+            item for item, key in zip(bindings, keys) if key == top
+        ]
+
+    def _queue_bindings(self, event, position):
+        """
+        Returns the bindings of a queue event enabled at the current clock,
+        as a part of `EnabledBindings`, or None if there are none.
+
+        A queue event takes a token from the place at the given position of
+        its incoming places, and the first token of each of the others, 
+        which are resource pools. Its bindings are those of 
+        `iter_event_bindings`: one for each token on the queue that is
+        available, in the order of the marking, with the first tokens of the
+        pools. They are made from the marking when looked up, so that the 
+        queue is not enumerated, neither when tokens are added to or taken
+        from it, nor when the first token of a pool changes.
+        """
+        clock = self.clock
+        incoming = event.incoming
+        pooled = []
+        # the latest token on the pools, by time and then position, which
+        # is the one completing a binding with an earlier token
+        latest = None
+        for i, place in enumerate(incoming):
+            if i == position:
+                continue
+            marking = place.marking
+            if not marking or marking[0].time > clock:
+                return None
+            token = marking[0]
+            pooled.append((place, token))
+            if latest is None or (token.time, i) > latest:
+                latest = (token.time, i)
+        queue = incoming[position]
+        ready = queue.marking.bisect_key_right(clock)
+        if ready == 0:
+            return None
+        before = tuple(pooled[:position])
+        after = tuple(pooled[position:])
+
+        def make(token):
+            time = token.time
+            if latest is not None and latest > (time, position):
+                time = latest[0]
+            return (before + ((queue, token),) + after, time, event)
+        tokens = _Prefix(queue.marking, ready)
+        if self._key is None:
+            return tokens, make, None, None
+        if position > 0:
+            # the key is that of the first token on a pool
+            return tokens, make, self._key(pooled[0][1]), tokens
+        keyed = self._keyed.get(queue)
+        if keyed is None:
+            keyed = self._keyed[queue] = _KeyedTokens(queue, self._key)
+        keyed.update(clock)
+        top = max(keyed.buckets)
+        return tokens, make, top, keyed.buckets[top]
+
+    def iter_event_bindings(self, event, until=None):
+        """
+        Lazily yields the bindings that enable the given event, see 
+        `event_bindings`, in order of their enabling time.
+        Tokens are merged over the incoming places by time, so a binding is 
+        only produced once its latest token has been reached and the 
+        Cartesian product is never materialised. Enumeration stops as soon
+        as the enabling time would pass `until`, if given.
+        For events without a guard, only the first available token of a 
+        resource pool place (see `bpmn.ResourcePool`) is considered, as its
+        resources are interchangeable.
+        Assumes the marking of each place is ordered by token time, which is
+        the default priority of a SimVar.
+
+        :param event: the event for which to yield the enabling bindings.
+        :param until: the latest enabling time of interest, e.g. the clock.
+        :return: generator of tuples (((place, token), (place, token), ...), time)
+        """
+        incoming = event.incoming
+        nr_incoming_places = len(incoming)
+        if nr_incoming_places == 0:
+            raise Exception("Though it is strictly speaking possible, we do not allow events like '" + str(self) + "' without incoming arcs.")
+        markings = [place.marking for place in incoming]
+        if not all(markings):
+            return
+        if until is not None \
+            and any(marking[0].time > until for marking in markings):
+            return
+        guard = event.guard
+        if guard is None:
+            markings = [
+                islice(marking, 1) 
+                if getattr(place, '_resource_pool', False) else marking
+                for place, marking in zip(incoming, markings)
+            ]
+
+        # tokens already passed over, per incoming place
+        seen = [[] for _ in incoming]
+        streams = [
+            zip(repeat(i), marking) for i, marking in enumerate(markings)
+        ]
+        for i, token in merge(*streams, key=lambda item: item[1].time):
+            time = token.time
+            if until is not None and time > until:
+                return
+            # the current token is the latest of any binding it completes
+            pools = [
+                (token,) if j == i else seen[j]
+                for j in range(nr_incoming_places)
+            ]
+            seen[i].append(token)
+            if not all(pools):
+                continue
+            for tokens in product(*pools):
+                if guard is not None:
+                    values = [tok.value for tok in tokens]
+                    try:
+                        enabled = guard(*values)
+                    except Exception as e:
+                        raise TypeError("Event " + str(event) + ": guard generates exception for values " + str(values) + ".") from e
+                    if self._debugging and not isinstance(enabled, bool):
+                        raise TypeError("Event " + str(event) + ": guard does evaluate to a Boolean for values " + str(values) + ".")
+                    if not enabled:
+                        continue
+                yield (tuple(zip(incoming, tokens)), time)
+
     def event_bindings(self, event):
         """
         Calculates the set of bindings that enables the given event.
@@ -129,125 +602,113 @@ class ParallelSimProblem(SimProblem):
         :param event: the event for which to calculate the enabling bindings.
         :return: list of tuples ([(place, token), (place, token), ...], time)
         """
-        nr_incoming_places = len(event.incoming)
-        if nr_incoming_places == 0:
-            raise Exception("Though it is strictly speaking possible, we do not allow events like '" + str(self) + "' without incoming arcs.")
-
-        bindings = [[]]
-        place_token_products = [
-            list(product([place], [ tok  for tok  in place.marking ]))
-            for place in event.incoming
-        ]
-        bindings = product(*place_token_products)
-        
-        def handle(binding):
-            variable_values = []
-            time = None
-            for (place, token) in binding:
-                if (event.guard is not None):
-                    variable_values.append(token.value)
-                if time is None or token.time > time:
-                    time = token.time
-            return (binding, time, variable_values)
-
-        # a binding must have all incoming places
-        
-        new_bindings = [
-            handle(binding)
-            for binding in bindings
-            if len(binding) == nr_incoming_places
-        ]
-        bindings = new_bindings
-
-        # if a event has a guard, only bindings are enabled for which the guard evaluates to True
-        if event.guard is not None:
-            result = [
-                (binding, time)
-                for (binding, time, variable_values)
-                in new_bindings
-                if event.guard(*variable_values)
-            ]
-        else :
-            result = [
-                (binding, time)
-                for (binding, time, _)
-                in new_bindings
-            ]
-
-        # result = []
-        # for binding in bindings:
-        #     variable_values = []
-        #     time = None
-        #     for (place, token) in binding:
-        #         variable_values.append(token.value)
-        #         if time is None or token.time > time:
-        #             time = token.time
-        #     enabled = True
-        #     if event.guard is not None:
-        #         try:
-        #             enabled = event.guard(*variable_values)
-        #         except Exception as e:
-        #             raise TypeError("Event " + event + ": guard generates exception for values " + str(variable_values) + ".") from e
-        #     if enabled:
-        #         result.append((binding, time))
-
-        return result
+        return list(self.iter_event_bindings(event))
 
     def bindings(self):
         """
         Calculates the set of timed bindings that is enabled over all events in the problem.
         Each binding is a tuple ([(place, token), (place, token), ...], time, event) that represents a single enabling binding.
         If no timed binding is enabled at the current clock time, updates the current clock time to the earliest time at which there is.
-        :return: list of tuples ([(place, token), (place, token), ...], time, event)
+        The bindings are an `EnabledBindings` sequence over the cached 
+        bindings of each event, which holds until the next firing.
+        :return: sequence of tuples ([(place, token), (place, token), ...], time, event)
         """
-        min_enabling_time = None
+        if self._indexed_events != len(self.events):
+            self._index_events()
 
-        # find the smallest largest enabling time for an event's
-        # incoming markings
-        timings = dict()
-        for ev in self.events:
-            smallest = []
-            skip = False
-            added = False
-            
-            for place in ev.incoming:
-                try:
-                    smallest.append(place.marking[0].time)
-                    added = True
-                except:
-                    skip = True
-            
-            if (skip or not added):
-                timings[ev] = 0
-                continue
+        timed_bindings = self._enabled_bindings()
+        # timed bindings are only enabled if they have time <= clock
+        # if there are no such bindings, move the clock to the next time a 
+        # token becomes available, until some event is enabled
+        while not timed_bindings and self._advance_clock():
+            timed_bindings = self._enabled_bindings()
+        return timed_bindings
 
-            smallest_largest = max(smallest)
-            timings[ev] = smallest_largest
+    def _enabled_bindings(self):
+        if not self._incremental:
+            self._dirty_events.clear()
+            return [
+                (binding, time, ev)
+                for ev in self.events
+                for binding, time in self.iter_event_bindings(ev, until=self.clock)
+            ]
+        # Only events touched by the last firing, by tokens becoming 
+        # available, or reading SimVarTime recompute their bindings, the 
+        # rest come from the cache. Events without bindings are skipped.
+        for ev in self._dirty_events | self._volatile_events:
+            self._event_part(ev)
+        # bindings are listed in the order of the events of the problem, so
+        # the choice of binding does not depend on the history of the cache
+        cache = self._binding_cache
+        return EnabledBindings([ cache[ev][:2] for ev in self.events if ev in cache ])
 
-            if (smallest_largest == 0):
-                continue
+    def _candidates(self, bindings):
+        """
+        Returns the enabled bindings that the binding priority is handed, 
+        only those with the highest key if it has one, see `__init__`.
+        """
+        if self._key is None or not self._incremental:
+            return bindings
+        cache = self._binding_cache
+        parts = [ cache[ev] for ev in self.events if ev in cache ]
+        top = max(part[2] for part in parts)
+        return EnabledBindings(
+            [ (part[3], part[1]) for part in parts if part[2] == top ],
+            top_key=top, enabled=len(bindings)
+        )
+
+    def fire(self, timed_binding):
+        """
+        Fires the specified timed binding, see `SimProblem.fire`, and marks
+        the events next to the places it changed, whose cached bindings are
+        recomputed on the next step. The tokens it took are dropped from the
+        tokens kept by key.
+        """
+        super().fire(timed_binding)
+        binding, _, event = timed_binding
+        if self._keyed:
+            for place, token in binding:
+                keyed = self._keyed.get(place)
+                if keyed is not None:
+                    keyed.remove(token)
+            # a queue is taken or put back as a whole, at any time
+            for place in event.incoming + event.outgoing:
+                if hasattr(place, 'simvar'):
+                    self._keyed.pop(place.simvar, None)
+        self._changed(event.incoming)
+        self._changed(event.outgoing)
 
-            # keep track of the smallest next possible clock
-            if (smallest_largest is not None) \
-                and (min_enabling_time is None \
-                     or smallest_largest < min_enabling_time):
-                min_enabling_time = smallest_largest 
+    def restore_checkpoint(self, name):
+        super().restore_checkpoint(name)
+        self.invalidate_bindings()
 
-        # timed bindings are only enabled if they have time <= clock
-        # if there are no such bindings, set the clock to the earliest time at which there are
-        if min_enabling_time is not None and min_enabling_time > self.clock:
-            self.clock = min_enabling_time
-        # We now also need to update the bindings, because the SimVarTime may have changed and needs to be updated.
-        # TODO This is inefficient, because we are recalculating all bindings, while we only need to recalculate the ones that have SimVarTime in their inflow.
-        timed_bindings = [] 
-        for t, earlist in timings.items():
-            if earlist > self.clock:
-                continue
-            for (binding, time) in self.event_bindings(t):
-                if (time <= self.clock):
-                    timed_bindings.append((binding, time, t))
-        # now return the untimed bindings + the timed bindings that have time <= clock
-        return timed_bindings
+    def __getstate__(self):
+        """
+        Leaves out the cached bindings and the future event list, which are
+        rebuilt from the markings, and the timings collector.
+        """
+        state = self.__dict__.copy()
+        for attr in ("_binding_cache", "_dirty_events", "_place_events",
+                     "_volatile_events", "_queue_events", "_key", "_keyed",
+                     "_future", "_future_seq", "_scheduled"):
+            state.pop(attr, None)
+        state["timings"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._binding_cache = dict()
+        self._dirty_events = set()
+        self._place_events = dict()
+        self._volatile_events = set()
+        self._queue_events = dict()
+        self._key = None
+        self._keyed = dict()
+        self._future = []
+        self._future_seq = count()
+        self._scheduled = dict()
+        # reindexed on the next call to bindings
+        self._indexed_events = -1
     
     def step(self):
         """
@@ -255,46 +716,58 @@ class ParallelSimProblem(SimProblem):
         If multiple events can happen, one is selected at random.
         Returns the binding that happened, or None if no event could happen.
         """
+        if self.timings is None:
+            bindings = self.bindings()
+            if len(bindings) > 0:
+                timed_binding = self.binding_priority(self._candidates(bindings))
+                self.fire(timed_binding)
+                return timed_binding
+            return None
+
         start = now()
         bindings = self.bindings()
-        end = now() - start 
-        print(f"bindings took {end:0.4f}s")
-        
+        took_bindings = now() - start
         if len(bindings) > 0:
             start = now()
-            timed_binding = self.binding_priority(bindings)
-            end = now() - start 
-            print(f"priority took {end:0.4f}s")
+            timed_binding = self.binding_priority(self._candidates(bindings))
+            took_priority = now() - start
             start = now()
             self.fire(timed_binding)
-            end = now() - start 
-            print(f"firing took {end:0.4f}s")
+            took_firing = now() - start
+            self.timings.record(took_bindings, took_priority, took_firing)
             return timed_binding
+        self.timings.record(took_bindings)
         return None
     
-    def simulate(self, duration, reporter=None):
-        active_model = True
+    def simulate(self, duration, reporter=None, progress_interval=0.5):
+        """
+        Simulates until the clock passes the duration or nothing can happen,
+        calling the reporter (or each of a list of them) with every binding
+        that fired. The progress bar is only refreshed every 
+        `progress_interval` seconds of wall-clock time.
+        """
+        reporters = []
+        if reporter is not None:
+            reporters = reporter if type(reporter) == list else [reporter]
         custom_bar_format = '{l_bar}{bar}| {n:.1f}/{total:.1f} [{elapsed}<{remaining}, {rate_fmt}]'
         pbar = tqdm(
             desc="Simulating...", 
             total=duration,
             bar_format=custom_bar_format
         )
-        while self.clock <= duration and active_model:
-            last = self.clock
-            bindings = self.bindings()
-            if len(bindings) > 0:
-                timed_binding = self.binding_priority(bindings)
-                self.fire(timed_binding)
-                if reporter is not None:
-                    if type(reporter) == list:
-                        for r in reporter:
-                            r.callback(timed_binding)
-                    else:
-                        reporter.callback(timed_binding)
-            else:
-                active_model = False
-            pbar.update(self.clock - last)
+        shown = self.clock
+        next_update = now() + progress_interval
+        while self.clock <= duration:
+            timed_binding = self.step()
+            if timed_binding is None:
+                break
+            for r in reporters:
+                r.callback(timed_binding)
+            if now() >= next_update:
+                pbar.update(self.clock - shown)
+                shown = self.clock
+                next_update = now() + progress_interval
+        pbar.update(self.clock - shown)
         pbar.close()
 
     
\ No newline at end of file
@@ -0,0 +1,117 @@
+"""
+Streams of random variates for the durations and choices of a model, drawn
+with NumPy in blocks rather than one call at a time.
+
+Each task or gateway draws from its own stream, seeded from the seed of the
+problem and the name of the stream. So the i-th duration of a task is the
+same in every scenario run with the same seed, whatever happens elsewhere in
+the model, i.e. scenarios are compared with common random numbers.
+
+    def behaviour(c, r):
+        stream = shop.variates.stream("Generate Discrepancy")
+        return [SimToken((c, r), delay=pick_time(3, stream=stream))]
+
+Every `ParallelSimProblem` has a `variates`, seeded from the random module
+when the problem is made unless a seed is given, and reseeded with
+`problem.variates.seed(seed)`, e.g. for each replication of an experiment.
+"""
+from random import getrandbits
+from zlib import crc32
+
+import numpy as np
+
+BLOCK = 4096
+
+class VariateStream:
+    """
+    An independent stream of random variates, which are drawn in blocks of
+    `block` standard variates and scaled to the parameters of each call.
+    """
+
+    def __init__(self, name, seed, block=BLOCK):
+        self.name = name
+        self.block = block
+        self.seed(seed)
+
+    def seed(self, seed):
+        """
+        Restarts the stream from the given seed.
+        """
+        self._rng = np.random.default_rng([seed, crc32(self.name.encode())])
+        self._normals = iter(())
+        self._exponentials = iter(())
+        self._uniforms = iter(())
+
+    def _more_normals(self):
+        self._normals = iter(self._rng.standard_normal(self.block).tolist())
+        return next(self._normals)
+
+    def _more_exponentials(self):
+        self._exponentials = iter(
+            self._rng.standard_exponential(self.block).tolist()
+        )
+        return next(self._exponentials)
+
+    def _more_uniforms(self):
+        self._uniforms = iter(self._rng.random(self.block).tolist())
+        return next(self._uniforms)
+
+    def normal(self, mean=0.0, dev=1.0):
+        z = next(self._normals, None)
+        if z is None:
+            z = self._more_normals()
+        return mean + dev * z
+
+    def truncated_normal(self, mean, dev, low=0.0, high=None):
+        """
+        Returns a normal variate between low and high, drawing again until
+        one falls in between.
+        """
+        while True:
+            x = self.normal(mean, dev)
+            if x >= low and (high is None or x <= high):
+                return x
+
+    def exponential(self, mean):
+        e = next(self._exponentials, None)
+        if e is None:
+            e = self._more_exponentials()
+        return mean * e
+
+    def uniform(self, low=0.0, high=1.0):
+        u = next(self._uniforms, None)
+        if u is None:
+            u = self._more_uniforms()
+        return low + (high - low) * u
+
+class Variates:
+    """
+    The streams of random variates of a problem, by name.
+
+    :param seed: the seed of all the streams, by default drawn from the
+    random module.
+    """
+
+    def __init__(self, seed=None, block=BLOCK):
+        self.block = block
+        self.streams = dict()
+        self.seed(seed)
+
+    def seed(self, seed=None):
+        """
+        Restarts every stream from the given seed, combined with its name.
+        """
+        self._seed = getrandbits(64) if seed is None else seed
+        for stream in self.streams.values():
+            stream.seed(self._seed)
+
+    def stream(self, name):
+        """
+        Returns the stream with the given name, starting it if needed.
+        """
+        stream = self.streams.get(name)
+        if stream is None:
+            stream = self.streams[name] = VariateStream(
+                name, self._seed, self.block
+            )
+        return stream
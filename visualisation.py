@@ -8,7 +8,7 @@ from simpn.visualisation import Shape, Hook, PlaceViz, Edge, Node, Visualisation
 from time import time
 from enum import Enum, auto
 import math
-import imageio
+import numpy as np
 from typing import Literal
 
 
@@ -27,6 +27,47 @@ GRID_SPACING = 50
 LINE_WIDTH = 2
 ARROW_WIDTH, ARROW_HEIGHT = 12, 10
 TEXT_SIZE = 16
+# the surface a node is drawn onto to find where it draws, see __extent
+SCRATCH_SIZE = 800, 400
+
+# fonts by size and weight, as looking up a system font is slow
+_fonts = dict()
+# rendered text that does not change, e.g. the names of nodes
+_texts = dict()
+
+def get_font(bold=False, size=TEXT_SIZE):
+    """
+    Returns the Calibri font of the given size and weight, made once.
+    """
+    key = (size, bold)
+    font = _fonts.get(key)
+    if font is None:
+        font = _fonts[key] = pygame.font.SysFont('Calibri', size, bold=bold)
+    return font
+
+def render_text(text, colour, bold=False, size=TEXT_SIZE):
+    """
+    Returns the rendered surface of a text that does not change, such as a
+    label, rendering it only the first time it is asked for.
+    """
+    key = (text, colour, bold, size)
+    label = _texts.get(key)
+    if label is None:
+        label = _texts[key] = get_font(bold, size).render(text, True, colour)
+    return label
+
+def render_changing(owner, slot, text, colour, bold=False, size=TEXT_SIZE):
+    """
+    Returns the rendered surface of a text that changes over time, such as
+    the marking of a node, kept on the owner under the name `slot` and only
+    rendered again when the text differs from the last time.
+    """
+    key = (text, colour, bold, size)
+    cached = getattr(owner, slot, None)
+    if cached is None or cached[0] != key:
+        cached = (key, get_font(bold, size).render(text, True, colour))
+        setattr(owner, slot, cached)
+    return cached[1]
 
 
 class CustomPlaceViz(PlaceViz):
@@ -38,11 +79,9 @@ class CustomPlaceViz(PlaceViz):
     def draw(self, screen):
         pygame.draw.circle(screen, TUE_LIGHTBLUE, (self._pos[0], self._pos[1]), self._half_height)
         pygame.draw.circle(screen, TUE_BLUE, (self._pos[0], self._pos[1]), self._half_height, LINE_WIDTH)    
-        font = pygame.font.SysFont('Calibri', TEXT_SIZE)
-        bold_font = pygame.font.SysFont('Calibri', TEXT_SIZE, bold=True)
 
         # draw label
-        label = font.render(self._model_node.get_id(), True, TUE_BLUE)
+        label = render_text(self._model_node.get_id(), TUE_BLUE)
         text_x_pos = self._pos[0] - int(label.get_width()/2)
         text_y_pos = self._pos[1] + self._half_height + LINE_WIDTH
         screen.blit(label, (text_x_pos, text_y_pos))
@@ -92,11 +131,11 @@ class CustomPlaceViz(PlaceViz):
                         LINE_WIDTH
                     )
 
-            label = bold_font.render(f"{n}+", True, TUE_RED)
+            label = render_text(f"{n}+", TUE_RED, bold=True)
             screen.blit(label, (self._pos[0]-self._half_height * 0.25, self._pos[1]-self._half_height * 0.25))
             mstr = f"(x{count}) last @ {round(markings[-1].time, 2)}"
             
-        label = bold_font.render(mstr, True, TUE_RED)
+        label = render_changing(self, "_marking_label", mstr, TUE_RED, bold=True)
         text_x_pos = self._pos[0] - int(label.get_width()/2)
         text_y_pos = self._pos[1] + self._half_height + LINE_WIDTH + int(label.get_height())
         screen.blit(label, (text_x_pos, text_y_pos))      
@@ -151,50 +190,9 @@ class CustomEdge(Edge):
         
         if connected_to_res_pool:
             # Draw dashed red line with opacity 0.33, always visible
-            dash_length = 10
-            gap_length = 24
-            line_width = int(LINE_WIDTH * 1.5)
-            direction = end - start
-            length = direction.length()
-            if length == 0:
-                return
-            direction = direction.normalize()
-            color = TUE_RED
-            alpha = int(255 * 0.33)
-            num_dashes = int(length // (dash_length + gap_length))
-            # Find bounding box for all dashes
-            all_points = []
-            for i in range(num_dashes + 1):
-                seg_start = start + direction * (i * (dash_length + gap_length))
-                seg_end = seg_start + direction * dash_length
-                if (seg_end - start).length() > length:
-                    seg_end = end
-                dash_len = (seg_end - seg_start).length()
-                if dash_len == 0:
-                    continue
-                all_points.extend([seg_start, seg_end])
-            if not all_points:
-                return
-            min_x = min(p.x for p in all_points)
-            min_y = min(p.y for p in all_points)
-            max_x = max(p.x for p in all_points)
-            max_y = max(p.y for p in all_points)
-            surf_w = int(abs(max_x - min_x)) + line_width
-            surf_h = int(abs(max_y - min_y)) + line_width
-            temp_surface = pygame.Surface((surf_w, surf_h), pygame.SRCALPHA)
-            # Draw all dashes on one surface
-            for i in range(num_dashes + 1):
-                seg_start = start + direction * (i * (dash_length + gap_length))
-                seg_end = seg_start + direction * dash_length
-                if (seg_end - start).length() > length:
-                    seg_end = end
-                dash_len = (seg_end - seg_start).length()
-                if dash_len == 0:
-                    continue
-                start_pos = (seg_start.x - min_x, seg_start.y - min_y)
-                end_pos = (seg_end.x - min_x, seg_end.y - min_y)
-                pygame.draw.line(temp_surface, (*color, alpha), start_pos, end_pos, line_width)
-            screen.blit(temp_surface, (min_x, min_y))
+            dashes = self.__dashes(start, end)
+            if dashes is not None:
+                screen.blit(*dashes)
             return
 
         # Create the triangle head around the origin
@@ -229,6 +227,57 @@ class CustomEdge(Edge):
 
             pygame.draw.polygon(screen, TUE_BLUE, body_verts)
 
+    def __dashes(self, start, end):
+        """
+        Returns the surface with the dashed line from start to end and where
+        to blit it, or None if there is nothing to draw. The surface is made
+        once for the positions of the nodes, and again only when one of them
+        moves.
+        """
+        key = (tuple(start), tuple(end))
+        cached = getattr(self, "_dashes", None)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        self._dashes = (key, None)
+        dash_length = 10
+        gap_length = 24
+        line_width = int(LINE_WIDTH * 1.5)
+        direction = end - start
+        length = direction.length()
+        if length == 0:
+            return None
+        direction = direction.normalize()
+        color = TUE_RED
+        alpha = int(255 * 0.33)
+        num_dashes = int(length // (dash_length + gap_length))
+        segments = []
+        for i in range(num_dashes + 1):
+            seg_start = start + direction * (i * (dash_length + gap_length))
+            seg_end = seg_start + direction * dash_length
+            if (seg_end - start).length() > length:
+                seg_end = end
+            if (seg_end - seg_start).length() == 0:
+                continue
+            segments.append((seg_start, seg_end))
+        if not segments:
+            return None
+        # Find bounding box for all dashes
+        all_points = [ point for segment in segments for point in segment ]
+        min_x = min(p.x for p in all_points)
+        min_y = min(p.y for p in all_points)
+        max_x = max(p.x for p in all_points)
+        max_y = max(p.y for p in all_points)
+        surf_w = int(abs(max_x - min_x)) + line_width
+        surf_h = int(abs(max_y - min_y)) + line_width
+        temp_surface = pygame.Surface((surf_w, surf_h), pygame.SRCALPHA)
+        # Draw all dashes on one surface
+        for seg_start, seg_end in segments:
+            start_pos = (seg_start.x - min_x, seg_start.y - min_y)
+            end_pos = (seg_end.x - min_x, seg_end.y - min_y)
+            pygame.draw.line(temp_surface, (*color, alpha), start_pos, end_pos, line_width)
+        self._dashes = (key, (temp_surface, (min_x, min_y)))
+        return self._dashes[1]
+
     
 
 class Visualisation(Visualisation):
@@ -241,9 +290,15 @@ class Visualisation(Visualisation):
     - grid_spacing (int): the spacing between grid lines (default: 50)
     - node_spacing (int): the spacing between nodes (default: 100)
     - layout_algorithm (str): the layout algorithm to use (default: "auto"), possible values: auto, sugiyama, davidson_harel, grid
+    - record (bool or str): record the window as it runs to output-NNN.gif, or to the given .gif or .mp4 file, see recording.py (default: False)
+    - record_every (int): record only every k-th frame (default: 1)
+    - record_scale (float): the scale of the recorded frames to the window, e.g. 0.5 for half the size (default: 1.0)
+    - checkpoint (str): a file to write a checkpoint of the simulation to when the window closes or drawing fails, see `snapshot.save_checkpoint` (optional)
+    - background (bool): simulate the problem in another process, which sends its state to draw about every frame, see background.py (default: False)
 
     Methods:
     - save_layout(self, filename): saves the layout to a file
+    - save_checkpoint(self): saves the simulation to the checkpoint file
     - show(self): shows the visualisation
     """
     def __init__(self, 
@@ -252,7 +307,11 @@ class Visualisation(Visualisation):
         grid_spacing=50, 
         node_spacing=100, 
         layout_algorithm:Literal["auto", "sugiyama","davidson_harel","grid"]='auto',
-        record=False
+        record=False,
+        record_every=1,
+        record_scale=1.0,
+        checkpoint=None,
+        background=False
         ):
         pygame.init()
         pygame.font.init()
@@ -273,11 +332,29 @@ class Visualisation(Visualisation):
         self._selected_nodes = None        
         self._zoom_level = 1.0
         self._size = MAX_SIZE
-        self._frames = []
         self._record = record
+        self._record_every = record_every
+        self._record_scale = record_scale
+        self._recorder = None
         self._speed = 1
         self._speed_complete = 0
         self._speed_time = 0
+        self._checkpoint = checkpoint
+        self._stepping = False
+        self._worker = None
+        if background:
+            from background import SimulationWorker
+            self._worker = SimulationWorker(sim_problem)
+        # the viznode drawing each place and event, by its id
+        self._element_nodes = dict()
+        # what needs drawing in the next frame, see __draw
+        self._redraw = True
+        self._overlay_dirty = True
+        self._dirty_nodes = set()
+        self._extents = None
+        self._overlay = None
+        self._drawn_clock = None
+        self.__scratch = pygame.Surface(SCRATCH_SIZE, pygame.SRCALPHA)
 
         self.__create_buttons_closed_menu()
 
@@ -304,6 +381,10 @@ class Visualisation(Visualisation):
                 self._nodes[event.get_id()] = event_viznode
                 if event.visualize_edges:
                     viznodes_with_edges.append(event_viznode)
+        for element_id, prototype_id in element_to_prototype.items():
+            self._element_nodes[element_id] = self._nodes[prototype_id]
+        for node_id, viznode in self._nodes.items():
+            self._element_nodes.setdefault(node_id, viznode)
         # Add visualization for edges.
         # If an edge is from or to a prototype element, it must be from or to the prototype itself.
         for viznode in viznodes_with_edges:
@@ -351,41 +432,184 @@ class Visualisation(Visualisation):
 
     
     def __draw(self):
+        """
+        Draws the net onto the window. The edges are drawn once onto a 
+        background layer, which is kept until the layout, zoom or window 
+        changes. In between, only the nodes whose places changed since the
+        last frame (see __step) are redrawn, together with the debug info.
+        """
+        if self._redraw or self._extents is None:
+            self.__draw_all()
+        else:
+            self.__draw_dirty()
+        self._redraw = False
+        self._overlay_dirty = False
+        self._dirty_nodes.clear()
+        self._drawn_clock = self._problem.clock
+
+    def __draw_all(self):
         self.__screen = pygame.Surface(
             (self._size[0]/self._zoom_level, 
              self._size[1]/self._zoom_level)
         )
-        self.__win.fill(TUE_GREY)
         self.__screen.fill(TUE_GREY)
         for shape in self._edges:
             shape._curr_time = self._problem.clock
             shape.draw(self.__screen)
+        # nodes move on every frame of a drag, so the background and where 
+        # nodes draw are only worked out once they are dropped
+        measure = self._selected_nodes is None
+        self._extents = dict() if measure else None
+        if measure:
+            self.__background = self.__screen.copy()
         for shape in self._nodes.values():
             shape._curr_time = self._problem.clock
+            if measure:
+                self._extents[shape] = self.__extent(shape)
             shape.draw(self.__screen)
-        self.__debug_info()
+        self._overlay = self.__debug_info()
         # scale the entire screen using the self._zoom_level and draw it in the window
-        self.__screen.get_width()
+        self.__win.fill(TUE_GREY)
         self.__win.blit(pygame.transform.smoothscale(self.__screen, (self._size[0], self._size[1])), (0, 0))
         # draw buttons
         for button in self.buttons:
             button.draw(self.__win)
         pygame.display.flip()
 
+    def __draw_dirty(self):
+        clock = self._problem.clock
+        if clock != self._drawn_clock:
+            # tokens that were still to come are drawn differently once 
+            # the clock passes them, markings are sorted by time so the 
+            # last token is the latest
+            for place in self._problem.places:
+                node = self._element_nodes.get(place.get_id())
+                marking = place.marking
+                if node is not None and node not in self._dirty_nodes \
+                    and marking and marking[-1].time > self._drawn_clock:
+                    self._dirty_nodes.add(node)
+        areas = [self._overlay]
+        for node in self._dirty_nodes:
+            node._curr_time = clock
+            extent = self.__extent(node)
+            areas.append(extent.union(self._extents.get(node, extent)))
+            self._extents[node] = extent
+        areas = self.__merge(areas)
+        for area in areas:
+            self.__screen.blit(self.__background, area, area)
+        for area in areas:
+            self.__screen.set_clip(area)
+            for node, extent in self._extents.items():
+                if extent.colliderect(area):
+                    node._curr_time = clock
+                    node.draw(self.__screen)
+        self.__screen.set_clip(None)
+        self._overlay = self.__debug_info()
+        areas.append(self._overlay)
+        updated = [ self.__present(area) for area in areas ]
+        for button in self.buttons:
+            button.draw(self.__win)
+        pygame.display.update(updated)
+
+    def __extent(self, node):
+        """
+        Returns the rect of the screen the node draws on, found by drawing
+        it onto a scratch surface, or the entire screen if it does not fit.
+        """
+        width, height = SCRATCH_SIZE
+        x, y = node._pos
+        dx, dy = width // 2 - int(x), height // 2 - int(y)
+        self.__scratch.fill((0, 0, 0, 0))
+        node._pos = (x + dx, y + dy)
+        try:
+            node.draw(self.__scratch)
+        finally:
+            node._pos = (x, y)
+        # numpy finds the pixels drawn much faster than get_bounding_rect
+        alpha = pygame.surfarray.pixels_alpha(self.__scratch)
+        columns = np.flatnonzero(alpha.any(axis=1))
+        rows = np.flatnonzero(alpha.any(axis=0))
+        del alpha
+        if len(columns) == 0:
+            return pygame.Rect(x, y, 0, 0)
+        if columns[0] == 0 or rows[0] == 0 \
+            or columns[-1] == width - 1 or rows[-1] == height - 1:
+            return self.__screen.get_rect()
+        drawn = pygame.Rect(
+            int(columns[0]) - dx, int(rows[0]) - dy,
+            int(columns[-1] - columns[0]) + 1, int(rows[-1] - rows[0]) + 1
+        )
+        # a pixel either way for positions rounded differently
+        return drawn.inflate(4, 4)
+
+    def __merge(self, areas):
+        """
+        Returns the areas with those that overlap joined, so that nothing 
+        is drawn twice.
+        """
+        merged = []
+        for area in areas:
+            area = area.clip(self.__screen.get_rect())
+            if area.width == 0 or area.height == 0:
+                continue
+            i = area.collidelist(merged)
+            while i >= 0:
+                area.union_ip(merged.pop(i))
+                i = area.collidelist(merged)
+            merged.append(area)
+        return merged
+
+    def __present(self, area):
+        """
+        Scales an area of the screen into the window, returning the area of
+        the window it covers. A margin around the area is scaled along with
+        it, so that its edges blend into what is around them, though they 
+        can be a pixel off from scaling the entire screen until it is next
+        drawn in full.
+        """
+        screen = self.__screen.get_rect()
+        x_scale = self._size[0] / screen.width
+        y_scale = self._size[1] / screen.height
+        area = area.clip(screen)
+        source = area.inflate(8, 8).clip(screen)
+        scaled = pygame.Rect(
+            round(source.left * x_scale), round(source.top * y_scale), 0, 0
+        )
+        scaled.width = round(source.right * x_scale) - scaled.left
+        scaled.height = round(source.bottom * y_scale) - scaled.top
+        target = pygame.Rect(
+            round(area.left * x_scale), round(area.top * y_scale), 0, 0
+        )
+        target.width = round(area.right * x_scale) - target.left
+        target.height = round(area.bottom * y_scale) - target.top
+        if target.width > 0 and target.height > 0:
+            self.__win.blit(
+                pygame.transform.smoothscale(
+                    self.__screen.subsurface(source), scaled.size
+                ),
+                target,
+                target.move(-scaled.left, -scaled.top)
+            )
+        return target
+
     def __debug_info(self):
+        """
+        Draws the clock and speed in the top left, returning the area drawn.
+        """
         y = ((self.__screen.get_height() * 0.5) / self._zoom_level)
-        font = pygame.font.SysFont('Calibri', TEXT_SIZE)
+        font = get_font()
+        drawn = []
         # add the current time of the problem in the top left
         label = font.render(f"Current Clock: {round(self._problem.clock,2)}", True, TUE_RED)
         text_x_pos = 5 / self._zoom_level
         text_y_pos = (label.get_height() / self._zoom_level) + y
-        self.__screen.blit(label, (text_x_pos, text_y_pos))
+        drawn.append(self.__screen.blit(label, (text_x_pos, text_y_pos)))
         y += (label.get_height() / self._zoom_level)
 
         text_x_pos = 5 / self._zoom_level
         text_y_pos = (label.get_height() / self._zoom_level) + y
         label = font.render(f"Speed: x{self._speed} ({self._speed_complete}) ({self._speed_time}ms)", True, TUE_RED)
-        self.__screen.blit(label, (text_x_pos, text_y_pos))
+        drawn.append(self.__screen.blit(label, (text_x_pos, text_y_pos)))
         y += (label.get_height() / self._zoom_level)
 
         if (hasattr(self, "_slow_move_dur")):
@@ -395,7 +619,7 @@ class Visualisation(Visualisation):
             )
             text_x_pos = 5 / self._zoom_level
             text_y_pos = (label.get_height() / self._zoom_level) + y
-            self.__screen.blit(label, (text_x_pos, text_y_pos))
+            drawn.append(self.__screen.blit(label, (text_x_pos, text_y_pos)))
             y+= (label.get_height() / self._zoom_level)
 
             if (self._problem.clock > 0):
@@ -405,17 +629,68 @@ class Visualisation(Visualisation):
                     )
                 text_x_pos = 5 / self._zoom_level
                 text_y_pos = (label.get_height() / self._zoom_level) + y
-                self.__screen.blit(label, (text_x_pos, text_y_pos))
+                drawn.append(self.__screen.blit(label, (text_x_pos, text_y_pos)))
                 y+= (label.get_height() / self._zoom_level)
+        return drawn[0].unionall(drawn[1:])
 
     def action_step(self):
+        if self._worker is not None:
+            self._worker.step(self._speed)
+            return
         t = time()
+        self._stepping = True
         for s in range(self._speed):
-            self._problem.step()
+            self.__step()
             if time() - t > 0.05:
                 break
+        self._stepping = False
         self._speed_complete = s + 1
         self._speed_time = int((time() - t) * 1000)
+        self._overlay_dirty = True
+
+    def __step(self):
+        """
+        Takes a step of the problem, marking the nodes of the places and the
+        event that fired as changed.
+        """
+        if self._worker is not None:
+            self._worker.step()
+            return None
+        timed_binding = self._problem.step()
+        if timed_binding is not None:
+            binding, _, event = timed_binding
+            self.__changed(event.get_id())
+            for place, _ in binding:
+                self.__changed(place.get_id())
+            for place in event.outgoing:
+                self.__changed(place.get_id())
+        return timed_binding
+
+    def __receive(self):
+        """
+        Restores the latest state sent by the worker into the problem, 
+        marking the nodes of what changed.
+        """
+        from background import restore
+        state = self._worker.latest()
+        if state is None:
+            return
+        restore(self._problem, state)
+        if state["changed"] is None:
+            self._redraw = True
+        else:
+            for element_id in state["changed"]:
+                self.__changed(element_id)
+        self._speed_complete = state["steps"]
+        self._speed_time = int(state["took"] * 1000)
+        self._overlay_dirty = True
+
+    def __changed(self, element_id):
+        if element_id.endswith(".queue"):
+            element_id = element_id[:-len(".queue")]
+        node = self._element_nodes.get(element_id)
+        if node is not None:
+            self._dirty_nodes.add(node)
 
     def __layout(self):
         graph = igraph.Graph()
@@ -460,6 +735,7 @@ class Visualisation(Visualisation):
         elif action == "increase":
             self._zoom_level *= 1.1
         self._zoom_level = max(0.3, min(self._zoom_level, 3.0))  # clamp zoom level
+        self._redraw = True
 
     def fit_to_screen(self, padding=40):
         """
@@ -495,15 +771,20 @@ class Visualisation(Visualisation):
         for node in self._nodes.values():
             x, y = node.get_pos()
             node.set_pos((x + offset_x, y + offset_y))
+        self._redraw = True
 
     def set_speed(self, speed):
         """
         Sets the maximum speed of simulating the problem per draw tick.
 
         Note that simulation steps (one increment of speed) only occur 
-        if the last draw was less then 50ms ago.
+        if the last draw was less then 50ms ago. When simulating in the 
+        background, the speed is the number of steps taken every tenth of a
+        second while rolling, however long they take.
         """
         self._speed = max(1, speed)
+        if self._worker is not None:
+            self._worker.set_speed(self._speed)
 
     def save_layout(self, filename):
         """
@@ -557,34 +838,62 @@ class Visualisation(Visualisation):
                 new_y = round(new_y/GRID_SPACING)*GRID_SPACING
             node.set_pos((new_x, new_y))
         self._selected_nodes = nodes, new_pos
+        self._redraw = True
 
     def start_slow_roll(self):
         self.__start_slow_roll()
 
+    def save_checkpoint(self):
+        """
+        Saves the simulation to the checkpoint file, unless it stopped in 
+        the middle of a step.
+        """
+        if self._checkpoint is None:
+            return
+        if self._worker is not None:
+            # the worker writes it in between two steps
+            self._worker.checkpoint(self._checkpoint)
+            print(f"Visualisation:: saving checkpoint to {self._checkpoint}...")
+            return
+        if self._stepping:
+            print("Visualisation:: simulation stopped mid-step, not saving a checkpoint...")
+            return
+        from snapshot import save_checkpoint
+        save_checkpoint(self._checkpoint, self._problem)
+        print(f"Visualisation:: saved checkpoint to {self._checkpoint}...")
+
     def __start_slow_roll(self):
         self._slow_rolling = True 
         self._slow_move_done = False
         self._slow_move_start = time()
         self._slow_move_dur = 0
         self._slow_last = pygame.time.get_ticks()
+        if self._worker is not None:
+            self._worker.roll(True)
 
     def __slow_roll(self):
-        if not self._slow_move_done:
-            self.action_step()
-            self._slow_move_done = True
-        if pygame.time.get_ticks() - self._slow_last >= 3 * (1000//30):
-            self._slow_move_done = False 
-            self._slow_last = pygame.time.get_ticks()
+        # a worker rolls on its own
+        if self._worker is None:
+            if not self._slow_move_done:
+                self.action_step()
+                self._slow_move_done = True
+            if pygame.time.get_ticks() - self._slow_last >= 3 * (1000//30):
+                self._slow_move_done = False 
+                self._slow_last = pygame.time.get_ticks()
         self._slow_move_dur = time() - self._slow_move_start
+        self._overlay_dirty = True
 
     def __stop_slow_roll(self):
         self._slow_rolling = False
         self._slow_move_dur = 0
+        if self._worker is not None:
+            self._worker.roll(False)
         
     def __handle_event(self, event):
         if event.type == pygame.QUIT:
             self.__running = False
         elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            self._redraw = True
             for button in self.buttons:
                 if button.click(event.pos):
                     return
@@ -600,17 +909,21 @@ class Visualisation(Visualisation):
             self.__drag()
         elif event.type == pygame.VIDEORESIZE:
             self._size = event.size
+            self._redraw = True
+        elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+            self._redraw = True
         elif event.type == pygame.KEYDOWN:
+            self._overlay_dirty = True
             if event.key == pygame.K_SPACE:
-                self._problem.step()
+                self.__step()
             elif event.key == pygame.K_r:
                 self.__start_slow_roll()
             elif event.key == pygame.K_s:
                 self.__stop_slow_roll()
             elif event.key == pygame.K_w:
-                self._speed += 1
+                self.set_speed(self._speed + 1)
             elif event.key == pygame.K_e:
-                self._speed = max(1, self._speed - 1)
+                self.set_speed(self._speed - 1)
             elif event.key == pygame.K_q:
                 pygame.event.post(pygame.event.Event(pygame.QUIT))    
             elif event.key == pygame.K_SPACE:
@@ -629,6 +942,20 @@ class Visualisation(Visualisation):
             else:
                 self.zoom("decrease") 
 
+    def __start_record(self):
+        from recording import Recorder
+        name = self._record
+        if type(name) != str:
+            i = 0
+            name = f"output-{i:03d}.gif"
+            while os.path.exists(name):
+                i += 1
+                name = f"output-{i:03d}.gif"
+        self._recorder = Recorder(
+            name, fps=30, every=self._record_every, scale=self._record_scale
+        )
+        print(f"Visualisation:: Recording to {name}...")
+
     def show(self):
             """
             Displays the Petri net visualisation in a window.
@@ -643,43 +970,42 @@ class Visualisation(Visualisation):
             self.__running = True
             self._slow_rolling = False
             zoomed = False
+            if self._worker is not None:
+                self._worker.set_speed(self._speed)
+                self._worker.start()
+            if (self._record):
+                self.__start_record()
             while self.__running:
                 for event in pygame.event.get():
                     self.__handle_event(event)
                 try:
-                    self.__draw()
+                    if self._worker is not None:
+                        self.__receive()
+                    # nothing is drawn while nothing changes, e.g. when paused
+                    if self._redraw or self._overlay_dirty or self._dirty_nodes:
+                        self.__draw()
                     if not zoomed:
                         self.fit_to_screen()
                         zoomed = True
                     if self._slow_rolling:
                         self.__slow_roll()
                     if (self._record):
-                        frame = pygame.surfarray.array3d(pygame.display.get_surface())
-                        frame = frame.transpose([1, 0, 2])  # Convert to (height, width, channels)
-                        self._frames.append(frame)
+                        self._recorder.capture(pygame.display.get_surface())
                 except Exception:
                     print("Error while drawing the visualisation.")
                     print(traceback.format_exc())
                     self.__running = False
                 clock.tick(30)
 
+            self.save_checkpoint()
+            if self._worker is not None:
+                from background import restore
+                final = self._worker.stop()
+                if final is not None:
+                    restore(self._problem, final)
             pygame.quit()
             if (self._record):
                 print("Visualisation:: Writing record...")
-                
-                import os 
-                i = 0
-                name = f"output-{i:03d}.gif"
-                while os.path.exists(name):
-                    name = f"output-{i:03d}.gif"
-                    i += 1
-
-                imageio.mimsave(name,
-                    self._frames,
-                    fps=30,
-                    palettesize=256,   
-                    subrectangles=True 
-                )
-
+                self._recorder.close()
                 print("Visualisation:: Finished writing record...")
                 